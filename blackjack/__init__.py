@@ -1,2 +1,15 @@
-from blackjack.simulator import Simulator
-from blackjack.player import Player
+__all__ = ['Simulator', 'Player']
+
+
+def __getattr__(name):
+    # resolved on first access, so importing a submodule (eg. in worker
+    # processes) does not import the whole simulator
+    if name == 'Simulator':
+        from blackjack.simulator import Simulator
+        return Simulator
+    if name == 'Player':
+        from blackjack.player import Player
+        return Player
+
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
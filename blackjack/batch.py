@@ -0,0 +1,178 @@
+import numpy as np
+from blackjack.db import DB
+from blackjack.deck import CARD_RANKS, CARD_VALUES, SUITS
+from blackjack.rng import RNG
+from blackjack.state import RANK_UNITS
+
+RANK_VALUES = np.array([CARD_VALUES[rank] for rank in CARD_RANKS])
+'''Value of each rank in `CARD_RANKS` order (aces counted as 1)'''
+
+ACE = CARD_RANKS.index('A')
+
+UNITS = np.array([RANK_UNITS[rank] for rank in CARD_RANKS], dtype=np.int64)
+'''State key increment of each rank in `CARD_RANKS` order'''
+
+DECK_SIZE = len(CARD_RANKS) * len(SUITS)
+'''Number of cards in one deck (card `i` has the rank index `i // 4`)'''
+
+ACTION_CODES = {'stand': 0, 'hit': 1}
+
+
+def hand_values(hard, aces):
+    '''
+    Vectorized hand value: `hard` is the value with every ace counted as
+    1, and one ace is counted as 11 where it does not bust the hand.
+    '''
+    return hard + 10 * ((aces > 0) & (hard <= 11))
+
+
+class BatchDealer:
+    '''
+    Vectorized counterpart of `blackjack.dealer.Dealer` for evaluating a
+    fixed policy: plays many rounds at once with NumPy arrays following
+    the same rules (fresh deck for every round, two cards for the player
+    and one for the house, the player acts while below 21, the house
+    draws to 17). Every round keeps a mask of the cards dealt from its
+    deck, so only the cards actually dealt are drawn.
+
+    Args:
+    -----
+    `policy`: dict(int: str): action ('hit' or 'stand') for state keys
+    (see `blackjack.state.encode_state`)
+
+    `default_action`: (str): action for states missing from the policy
+    (default='stand')
+
+    `batch_size`: (int): number of rounds played in one step
+    (default=100000)
+
+    `seed`: seed of the random generator (default=None)
+
+    `rng`: (blackjack.rng.RNG): random stream to draw from instead of a
+    new one of `seed`, eg. a child stream of a parallel run
+    (default=None)
+    '''
+
+    def __init__(self, policy, default_action='stand', batch_size=100000,
+                 seed=None, rng=None):
+        states = sorted(policy)
+        self.keys = np.array(states, dtype=np.int64)
+        self.actions = np.array([ACTION_CODES[policy[state]]
+                                 for state in states], dtype=np.int8)
+        self.default_action = ACTION_CODES[default_action]
+        self.batch_size = batch_size
+        self.rng = (rng or RNG(seed)).generator
+
+    @classmethod
+    def from_Q(cls, db=None, **kwargs):
+        '''
+        Creates a batch dealer playing the greedy policy of the Q table.
+        States with equal Q values are left to `default_action`.
+
+        Args:
+        -----
+        `db`: (blackjack.db.DB): database holding the Q table
+        (default: `DB()`)
+
+        Other keyword arguments are passed to the constructor.
+        '''
+        values = {}
+        for state, action, value in (db or DB()).load_Q():
+            values.setdefault(state, {})[action] = value
+
+        policy = {state: max(actions, key=actions.get)
+                  for state, actions in values.items()
+                  if len(set(actions.values())) > 1}
+
+        return cls(policy, **kwargs)
+
+    def _lookup(self, states):
+        '''
+        Returns the action codes of the policy for an array of states.
+        '''
+        if len(self.keys) == 0:
+            return np.full(len(states), self.default_action, dtype=np.int8)
+
+        pos = np.searchsorted(self.keys, states)
+        pos[pos == len(self.keys)] = 0
+        found = self.keys[pos] == states
+
+        return np.where(found, self.actions[pos], self.default_action)
+
+    def _deal(self, dealt, rows):
+        '''
+        Deals one card from the decks of the given rows. `dealt` holds a
+        52-bit mask of the already dealt cards of every round; a card is
+        drawn uniformly from the whole deck and drawn again while it has
+        already been dealt in its round.
+
+        Returns: (np.ndarray): the rank indices of the dealt cards
+        '''
+        cards = np.empty(len(rows), dtype=np.uint64)
+        pending = np.arange(len(rows))
+        while len(pending):
+            drawn = self.rng.integers(0, DECK_SIZE, len(pending),
+                                      dtype=np.uint64)
+            masks = np.left_shift(np.uint64(1), drawn)
+            new = dealt[rows[pending]] & masks == 0
+
+            cards[pending[new]] = drawn[new]
+            dealt[rows[pending[new]]] |= masks[new]
+            pending = pending[~new]
+
+        return (cards // len(SUITS)).astype(np.intp)
+
+    def _play_batch(self, n_rounds):
+        decks = np.zeros(n_rounds, dtype=np.uint64)
+        rows = np.arange(n_rounds)
+
+        first, second = self._deal(decks, rows), self._deal(decks, rows)
+        house = self._deal(decks, rows)
+
+        player_hard = RANK_VALUES[first] + RANK_VALUES[second]
+        player_aces = (first == ACE).astype(int) + (second == ACE)
+        states = UNITS[first] + UNITS[second] + house
+        house_hard = RANK_VALUES[house]
+        house_aces = (house == ACE).astype(int)
+
+        active = rows[hand_values(player_hard, player_aces) < 21]
+        while len(active):
+            hit = self._lookup(states[active]) == 1
+            active = active[hit]
+
+            cards = self._deal(decks, active)
+            player_hard[active] += RANK_VALUES[cards]
+            player_aces[active] += cards == ACE
+            states[active] += UNITS[cards]
+
+            values = hand_values(player_hard[active], player_aces[active])
+            active = active[values < 21]
+
+        player_values = hand_values(player_hard, player_aces)
+
+        drawing = rows[player_values <= 21]
+        while len(drawing):
+            values = hand_values(house_hard[drawing], house_aces[drawing])
+            drawing = drawing[values < 17]
+
+            cards = self._deal(decks, drawing)
+            house_hard[drawing] += RANK_VALUES[cards]
+            house_aces[drawing] += cards == ACE
+
+        house_values = hand_values(house_hard, house_aces)
+
+        return np.select(
+            [player_values > 21, house_values > 21,
+             player_values > house_values, player_values < house_values],
+            [-10, 10, 10, -10], 0).astype(np.int8)
+
+    def play(self, n_rounds):
+        '''
+        Plays `n_rounds` rounds with the policy.
+
+        Returns: (np.ndarray): the reward of every round (-10, 0 or 10)
+        '''
+        rewards = [self._play_batch(min(self.batch_size, n_rounds - done))
+                   for done in range(0, n_rounds, self.batch_size)]
+
+        return np.concatenate(rewards) if rewards else np.array([], np.int8)
@@ -0,0 +1,331 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import sklearn
+from blackjack.db import DB
+from blackjack.dealer import Dealer
+from blackjack.experience import ReplayBuffer
+from blackjack.deck import CARDS, Deck, Shoe
+from blackjack.logger import Logger
+from blackjack.model import Model, encode_features
+from blackjack.player import Player
+from blackjack.qstore import ArrayQStore, MemoryQStore, SQLiteQStore
+from blackjack.rng import RNG
+from blackjack.state import encode_state, reachable_states
+
+PERCENTILES = [50, 90, 99]
+
+Q_STORES = {'sqlite': SQLiteQStore, 'memory': MemoryQStore,
+            'array': ArrayQStore}
+
+
+def time_calls(func, n_calls):
+    '''
+    Calls `func(i)` for `i` in range(`n_calls`) and times every call.
+
+    Returns: dict with the number of `calls`, the `total` time in
+    seconds, the throughput in calls per second (`per_sec`) and the
+    latency percentiles of the calls in microseconds (`p50`, `p90`,
+    `p99`)
+    '''
+    latencies = np.empty(n_calls)
+    clock = time.perf_counter
+    for i in range(n_calls):
+        start = clock()
+        func(i)
+        latencies[i] = clock() - start
+
+    total = latencies.sum()
+    result = {'calls': n_calls,
+              'total': total,
+              'per_sec': n_calls / total if total else float('inf')}
+    for percentile, value in zip(PERCENTILES,
+                                 np.percentile(latencies * 1e6, PERCENTILES)):
+        result['p{}'.format(percentile)] = value
+
+    return result
+
+
+@contextlib.contextmanager
+def _player(q_store='memory', **kwargs):
+    '''
+    Context manager of a training player on a fresh database, which is a
+    temporary file for the `sqlite` Q store, so its cases include the
+    commits to disk, and in memory for the others.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.db') \
+            if q_store == 'sqlite' else ':memory:'
+        db = DB(path=path)
+        params = dict(epsilon=0.5, constant_epsilon=True,
+                      training_rounds=10 ** 9,
+                      logger=Logger(db, level='off'))
+        params.update(kwargs)
+
+        try:
+            yield Player(db=db, q_store=Q_STORES[q_store](db), **params)
+        finally:
+            db.close()
+
+
+class Benchmark:
+    '''
+    Benchmark suite of the components of the engine. Every case times
+    one operation over `calls` calls (scaled by the factor of the case
+    where an operation is much slower or faster than a round) and
+    reports its throughput and latency percentiles (see `time_calls`).
+
+    Cases:
+    `deck_deal`, `deck_reshuffle`, `shoe_deal`: dealing one card and
+    reshuffling
+    `evaluate_cards`: `Dealer.evaluate_cards` on random hands
+    `run_game_{store}`: training rounds of `Dealer.run_game` with each Q
+    store backend (the throughput is rounds per second), the `sqlite`
+    backend on a temporary database file
+    `action_{store}`: `Player.action` in training with each backend
+    `neighbors_{n}_cards`: `Player._update_neighbor_states` for hands of
+    `n` cards
+    `predict_action`, `predict_model`: modelled decisions through the
+    compiled policy table and through the model itself
+    `replay_update`: one `ReplayBuffer.update` of a batch of 256 random
+    transitions (the throughput is batches per second)
+
+    Args:
+    `calls`: (int): base number of calls per case (default=10000)
+    `seed`: (int): seed of the `random` module, which samples the
+    inputs of the cases, and of the `blackjack.rng.RNG` of the players,
+    decks and shoes (default=0)
+    '''
+
+    def __init__(self, calls=10000, seed=0):
+        self.calls = calls
+        self.seed = seed
+        self.cases = {
+            'deck_deal': (self._deck_deal, 1),
+            'deck_reshuffle': (self._deck_reshuffle, 0.1),
+            'shoe_deal': (self._shoe_deal, 1),
+            'evaluate_cards': (self._evaluate_cards, 1),
+            'predict_action': (self._predict_action, 1),
+            'predict_model': (self._predict_model, 0.01),
+            'replay_update': (self._replay_update, 0.1)
+        }
+        for store in Q_STORES:
+            scale = 0.1 if store == 'sqlite' else 1
+            self.cases['run_game_' + store] = (
+                lambda n, store=store: self._run_game(n, store), scale)
+            self.cases['action_' + store] = (
+                lambda n, store=store: self._action(n, store), scale)
+        for n_cards in range(3, 7):
+            self.cases['neighbors_{}_cards'.format(n_cards)] = (
+                lambda n, n_cards=n_cards: self._neighbors(n, n_cards), 0.1)
+
+    def _deck_deal(self, n):
+        deck = Deck(rng=RNG(self.seed))
+
+        def deal(i):
+            if len(deck.cards) == 0:
+                deck.reshuffle()
+            deck.deal()
+
+        return time_calls(deal, n)
+
+    def _deck_reshuffle(self, n):
+        deck = Deck(rng=RNG(self.seed))
+        return time_calls(lambda i: deck.reshuffle(), n)
+
+    def _shoe_deal(self, n):
+        shoe = Shoe(rng=RNG(self.seed))
+
+        def deal(i):
+            if shoe.needs_shuffle:
+                shoe.reshuffle()
+            shoe.deal()
+
+        return time_calls(deal, n)
+
+    def _evaluate_cards(self, n):
+        hands = [random.sample(CARDS, random.randint(2, 5)) for _ in range(n)]
+        return time_calls(lambda i: Dealer.evaluate_cards(hands[i]), n)
+
+    def _run_game(self, n, store):
+        with _player(store, rng=RNG(self.seed)) as player:
+            dealer = Dealer(player)
+            return time_calls(lambda i: dealer.run_game(), n)
+
+    def _action(self, n, store):
+        states = [encode_state(random.sample(CARDS, 2), random.choice(CARDS))
+                  for _ in range(n)]
+        options = ['stand', 'hit']
+
+        with _player(store, rng=RNG(self.seed)) as player:
+            return time_calls(lambda i: player.action(states[i], options), n)
+
+    def _neighbors(self, n, n_cards):
+        with _player(rng=RNG(self.seed)) as player:
+            hands = []
+            while len(hands) < n:
+                cards = random.sample(CARDS, n_cards)
+                if Dealer.evaluate_cards(cards) < 21:
+                    hands.append(encode_state(cards, random.choice(CARDS)))
+                    player.Q.init_Q(hands[-1], player.ACTIONS)
+
+            return time_calls(
+                lambda i: player._update_neighbor_states(hands[i], 'hit'), n)
+
+    def _replay_update(self, n):
+        store = ArrayQStore(DB(path=':memory:'))
+        buffer = ReplayBuffer(store, batch_size=256, rng=RNG(self.seed))
+        keys = store.space.keys.tolist()
+        for _ in range(buffer.batch_size * 10):
+            buffer.add(random.choice(keys), random.choice(store.actions),
+                       random.choice([-10, 0, 10]), random.choice(keys))
+        indices = buffer._store_new()
+        batches = [indices[random.randrange(10) * 256:][:256]
+                   for _ in range(n)]
+
+        return time_calls(lambda i: buffer.update(0.5, 0.9, batches[i]), n)
+
+    def _model(self):
+        states = reachable_states()
+        features = encode_features(states)
+        model = Model(db=DB(path=':memory:'))
+        model.model.fit(features, features[:, :13].sum(axis=1) < 3)
+        model.trained = True
+        model.compile_policy(states)
+
+        return model, states
+
+    def _predict_action(self, n):
+        model, states = self._model()
+        picks = random.sample(states, n) if n <= len(states) else \
+            random.choices(states, k=n)
+
+        return time_calls(lambda i: model.predict_action(picks[i]), n)
+
+    def _predict_model(self, n):
+        model, states = self._model()
+        picks = random.choices(states, k=n)
+
+        return time_calls(lambda i: model.predict_actions([picks[i]]), n)
+
+    def run(self, names=None):
+        '''
+        Runs the cases with the given names (default: every case).
+
+        Returns: (dict): results by case name
+        '''
+        results = {}
+        for name in names or self.cases:
+            case, scale = self.cases[name]
+            random.seed(self.seed)
+            results[name] = case(max(1, int(self.calls * scale)))
+            print(' >> {:<22} {:>12.0f}/s  p50 {:>9.1f}us  p99 {:>9.1f}us'
+                  .format(name, results[name]['per_sec'],
+                          results[name]['p50'], results[name]['p99']))
+
+        return results
+
+
+def environment():
+    '''
+    Returns the description of the machine and the library versions
+    stored with the results.
+    '''
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__}
+
+
+def save_results(results, path):
+    '''
+    Saves benchmark results with a timestamp and the `environment` as
+    JSON.
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'w') as file:
+        json.dump({'timestamp': datetime.now().isoformat(),
+                   'environment': environment(),
+                   'results': results}, file, indent=2)
+
+
+def load_results(path):
+    '''
+    Loads benchmark results saved by `save_results`.
+
+    Returns: (dict): results by case name
+    '''
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def compare(results, baseline, tolerance=0.2):
+    '''
+    Compares the throughput of the cases with a baseline.
+
+    Args:
+    `results`, `baseline`: dict of results by case name
+    `tolerance`: (float): allowed relative drop of the throughput
+    (default=0.2)
+
+    Returns: dict of (baseline, current, ratio) throughputs of the cases
+    slower than the baseline by more than `tolerance`
+    '''
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result['per_sec'] / baseline[name]['per_sec']
+        if ratio < 1 - tolerance:
+            regressions[name] = (baseline[name]['per_sec'],
+                                 result['per_sec'], ratio)
+
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the components of the blackjack engine')
+    parser.add_argument('cases', nargs='*',
+                        help='cases to run (default: all)')
+    parser.add_argument('--calls', type=int, default=10000,
+                        help='base number of calls per case')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='results/benchmark.json',
+                        help='JSON file of the results')
+    parser.add_argument('--baseline',
+                        help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative drop of throughput')
+    args = parser.parse_args(args)
+
+    results = Benchmark(calls=args.calls, seed=args.seed).run(
+        args.cases or None)
+    save_results(results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline),
+                              args.tolerance)
+        for name, (baseline, current, ratio) in regressions.items():
+            print(' !! {}: {:.0f}/s -> {:.0f}/s ({:.0%})'.format(
+                name, baseline, current, ratio))
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
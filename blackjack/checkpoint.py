@@ -0,0 +1,130 @@
+import copy
+import os
+import pickle
+from blackjack.replay import ReplayWriter
+
+CHECKPOINT_VERSION = 3
+
+
+class CheckpointException(Exception):
+    pass
+
+
+def atomic_dump(obj, path):
+    '''
+    Pickles `obj` into `path` atomically: the data is written into a
+    temporary file next to it and synced to disk, then the temporary
+    file replaces `path`, so a crash leaves either the previous or the
+    new file in place, never a partial one.
+    '''
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp_path, path)
+
+    # make the rename itself durable where directories can be synced
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def snapshot(simulator):
+    '''
+    Collects the state needed to continue a simulation: the learning
+    parameters, round counter and Q values of the player (the Q store
+    and the logger are flushed first), its random stream (shared with
+    the deck) and replay buffer, the deck of the dealer and the settings
+    of the simulator. The directory of a `blackjack.replay.ReplayWriter`
+    sink of the logger is saved to reopen it, other sinks raise
+    `CheckpointException`.
+
+    Returns: (dict)
+    '''
+    player = simulator.player
+    sink = player.logger.sink
+    if sink is not None and not isinstance(sink, ReplayWriter):
+        raise CheckpointException(
+            'a {} sink of the logger cannot be restored from a checkpoint'
+            .format(type(sink).__name__))
+
+    player.flush()
+
+    # methods replaced on the instance (eg. by `blackjack.profiling`) are
+    # not part of the state of the deck
+    deck = copy.copy(simulator.dealer.deck)
+    deck.__dict__ = {name: value for name, value in vars(deck).items()
+                     if not callable(value)}
+
+    # the Q values are saved on their own, the buffer is reattached to
+    # the restored Q store
+    replay = None
+    if player.replay is not None:
+        replay = copy.copy(player.replay)
+        replay.store = None
+
+    return {
+        'version': CHECKPOINT_VERSION,
+        'player_class': type(player),
+        'params': {'alpha': player.alpha,
+                   'gamma': player.gamma,
+                   'epsilon': player._epsilon,
+                   'constant_epsilon': player.constant_epsilon,
+                   'tolerance': player.tolerance,
+                   'training_rounds': player.training_rounds,
+                   'flush_rounds': player.flush_rounds,
+                   'neighbor_depth': player.neighbor_depth},
+        't': player.t,
+        'training': player.training,
+        'q_store_class': type(player.Q),
+        'Q': player.db.load_Q(),
+        'db': {'path': player.db.path,
+               'commit_rounds': player.db.commit_rounds,
+               'async_writes': player.db.async_writes},
+        'logger': {'level': player.logger.level,
+                   'sample_rounds': player.logger.sample_rounds,
+                   'buffer_size': player.logger.buffer_size},
+        'sink_directory': sink.directory if sink is not None else None,
+        'rng': player.rng,
+        'replay': replay,
+        'deck': deck,
+        'simulator': {'test_games': simulator.test_games,
+                      'workers': simulator.workers,
+                      'sync_rounds': simulator.sync_rounds,
+                      'seed': simulator.seed,
+                      'checkpoint_path': simulator.checkpoint_path,
+                      'checkpoint_rounds': simulator.checkpoint_rounds,
+                      'checkpoint_seconds': simulator.checkpoint_seconds,
+                      'n_decks': simulator.n_decks,
+                      'penetration': simulator.penetration}
+    }
+
+
+def load_checkpoint(path):
+    '''
+    Loads a checkpoint written by `blackjack.Simulator.checkpoint`.
+
+    Returns: (dict): see `snapshot`
+    '''
+    with open(path, 'rb') as file:
+        state = pickle.load(file)
+
+    if not isinstance(state, dict) or \
+            state.get('version') != CHECKPOINT_VERSION:
+        raise CheckpointException(
+            '{} is not a version {} checkpoint'.format(path,
+                                                       CHECKPOINT_VERSION))
+
+    return state
@@ -1,67 +1,237 @@
+import atexit
+import functools
 import os
 import pickle
 import sqlite3
-import pandas as pd
-import re
+import threading
 from datetime import datetime
-
-
-def tuple_adapter(input):
-    return str(input)
-
-
-def convert_state(state):
-    match = re.match(r'\(\((.*)\),\s(.{3})\)', state.decode('utf-8'))
-    player = match.group(1).replace('\'', '').replace(' ', '').split(',')
-    house = match.group(2).replace('\'', '')
-
-    return (tuple(player), house)
-
-
-sqlite3.register_adapter(tuple, tuple_adapter)
-sqlite3.register_converter('state', convert_state)
-
-
-class DB():
-    def __init__(self):
+from blackjack.export import ResultExporter
+from blackjack.writer import AsyncWriter
+
+_pool = threading.local()
+
+# The statements of the hot paths are constant strings, so the statement
+# cache of the connection prepares each of them only once
+SELECT_STATE_Q = 'SELECT action, value FROM Q WHERE state = ? ORDER BY action'
+SELECT_Q = 'SELECT value FROM Q WHERE state = ? AND action = ?'
+CHECK_STATE_Q = 'SELECT 1 FROM Q WHERE state = ? LIMIT 1'
+UPDATE_Q = 'UPDATE Q SET value = ? WHERE state = ? AND action = ?'
+UPSERT_Q = '''
+    INSERT INTO Q VALUES (?, ?, ?)
+    ON CONFLICT (state, action) DO UPDATE SET value = excluded.value
+'''
+INSERT_ACTION = 'INSERT INTO actions VALUES (?,?,?,?,?)'
+INSERT_RESULT = 'INSERT INTO results VALUES (?,?,?,?)'
+
+INDEXES = {
+    'actions_phase': 'actions (phase, round_no)',
+    'actions_round': 'actions (round_no)',
+    'results_phase': 'results (phase, round_no)'
+}
+'''Indexes of the log tables by name, for the phase filtered exports and
+the round range deletes'''
+
+
+@functools.lru_cache()
+def _insert_Q(n_actions):
+    '''
+    Returns the statement initializing the Q values of a state with
+    `n_actions` actions in one multi-row insert, existing rows are kept.
+    '''
+    return 'INSERT OR IGNORE INTO Q VALUES ' + \
+        ', '.join(['(?, ?, 0)'] * n_actions)
+
+
+def _close_connections(connections):
+    for con in connections.values():
         try:
-            os.mkdir('db')
-        except FileExistsError:
+            con.commit()
+            con.close()
+        except sqlite3.ProgrammingError:
             pass
 
-        try:
-            with self.connection as con:
-                con.execute('''
-                    CREATE TABLE results (phase TEXT, state TEXT, result INTEGER,
-                    round_no INTEGER PRIMARY KEY);
-                ''')
-        except sqlite3.OperationalError:
-            pass
 
-        try:
-            with self.connection as con:
-                con.execute('''
-                    CREATE TABLE actions (phase TEXT, state TEXT, action TEXT, 
-                    decision TEXT, round_no INTEGER);
-                ''')
-        except sqlite3.OperationalError:
-            pass
+class DB():
+    '''
+    Access layer for the SQLite database holding the Q values and the
+    logged actions and results.
+
+    Every thread (and process) keeps one long-lived connection per
+    database file, which is shared by all `DB` instances pointing to the
+    same file. The connection uses WAL journaling. Logging and Q writes
+    are not committed one by one, but grouped into one transaction per
+    `commit_rounds` rounds (see `DB.end_round`).
+
+    With `async_writes` the logged rows and the bulk Q writes
+    (`set_many_Q`) are handed over to a background thread instead (see
+    `blackjack.writer.AsyncWriter`), which commits them in its own
+    transactions while the game loop goes on. `commit` (and `close`)
+    waits for the queued rows, and so does every read of whole tables.
+    Single Q value writes of `blackjack.qstore.SQLiteQStore` stay
+    synchronous, as they are read back right away, and their pending
+    transaction is committed before rows are queued or waited for, so
+    the background thread is not locked out for `commit_rounds` rounds.
+    `commit_rounds` then only groups the synchronous writes made between
+    two queued batches, eg. between two flushes of the logger.
+
+    States are stored as the integer keys of `blackjack.state.encode_state`.
+    Tables of older databases storing stringified state tuples are
+    dropped and recreated.
+
+    Args:
+    -----
+    `path`: (str): path of the database file (default='db/blackjack.db')
+
+    `commit_rounds`: (int): number of rounds to group into one
+    transaction of the synchronous writes, the background thread of
+    `async_writes` commits on its own (default=1)
+
+    `async_writes`: (bool): write the logs and bulk Q values in a
+    background thread, not available for in-memory databases
+    (default=False)
+
+    `queue_size`: (int): maximum number of row batches waiting for the
+    background thread before writing blocks (default=1000)
+    '''
+
+    def __init__(self, path='db/blackjack.db', commit_rounds=1,
+                 async_writes=False, queue_size=1000):
+        self.path = path
+        self.commit_rounds = commit_rounds
+        self.async_writes = async_writes
+        self.queue_size = queue_size
+        self.rounds = 0
+        self._writer = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            try:
+                os.mkdir(directory)
+            except FileExistsError:
+                pass
 
-        try:
-            with self.connection as con:
-                con.execute('''
-                  CREATE TABLE Q (state TEXT, action TEXT, value INT,
-                  PRIMARY KEY (state, action))
-                ''')
-        except sqlite3.OperationalError:
-            pass
+        with self.connection as con:
+            for table in ['results', 'actions', 'Q']:
+                columns = con.execute('PRAGMA table_info({})'.format(table))
+                if ('state', 'TEXT') in [col[1:3] for col in columns]:
+                    print('Dropping table {} with text states'.format(table))
+                    con.execute('DROP TABLE {}'.format(table))
+
+            con.execute('''
+                CREATE TABLE IF NOT EXISTS results (phase TEXT, state INTEGER,
+                result INTEGER, round_no INTEGER PRIMARY KEY);
+            ''')
+            con.execute('''
+                CREATE TABLE IF NOT EXISTS actions (phase TEXT, state INTEGER,
+                action TEXT, decision TEXT, round_no INTEGER);
+            ''')
+            con.execute('''
+                CREATE TABLE IF NOT EXISTS Q (state INTEGER, action TEXT,
+                value INT, PRIMARY KEY (state, action))
+            ''')
+            for name, columns in INDEXES.items():
+                con.execute('CREATE INDEX IF NOT EXISTS {} ON {}'.format(
+                    name, columns))
 
     @property
     def connection(self):
-        return sqlite3.connect(
-            'db/blackjack.db', timeout=10, detect_types=sqlite3.PARSE_COLNAMES)
+        '''
+        Returns the pooled connection of the current thread and process,
+        opening it on first access.
+        '''
+        connections = getattr(_pool, 'connections', None)
+        if connections is None or _pool.pid != os.getpid():
+            connections = _pool.connections = {}
+            _pool.pid = os.getpid()
+            atexit.register(_close_connections, connections)
+
+        con = connections.get(self.path)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10,
+                                  check_same_thread=False)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            connections[self.path] = con
+
+        return con
+
+    @property
+    def writer(self):
+        '''
+        Returns the background writer of the process, starting it on
+        first access, or None if writes are synchronous.
+        '''
+        if not self.async_writes:
+            return None
+
+        if self._writer is None or self._writer.pid != os.getpid():
+            self._writer = AsyncWriter(self, queue_size=self.queue_size)
+
+        return self._writer
+
+    def _release(self):
+        '''
+        Commits the pending transaction of the pooled connection, so it
+        does not hold the write lock the background writer waits for.
+        '''
+        con = self.connection
+        if con.in_transaction:
+            con.commit()
+            self.rounds = 0
+
+    def _write_many(self, statement, rows):
+        writer = self.writer
+        if writer is None:
+            self.connection.executemany(statement, rows)
+        else:
+            self._release()
+            writer.put(statement, list(rows))
+
+    def _sync(self):
+        '''
+        Waits for the rows queued for the background writer.
+        '''
+        if self._writer is not None and self._writer.pid == os.getpid():
+            self._release()
+            self._writer.flush()
+
+    def commit(self):
+        '''
+        Commits the pending transaction of the pooled connection, then
+        waits for the background writer.
+        '''
+        self.connection.commit()
+        self.rounds = 0
+        self._sync()
+
+    def end_round(self):
+        '''
+        Marks the end of a round and commits the pending writes after
+        every `commit_rounds` rounds. The background writer commits on
+        its own, so it is not waited for.
+        '''
+        self.rounds += 1
+        if self.rounds >= self.commit_rounds:
+            self.connection.commit()
+            self.rounds = 0
+
+    def close(self):
+        '''
+        Stops the background writer after writing the queued rows, then
+        commits and closes the pooled connection of the current thread.
+        '''
+        if self._writer is not None and self._writer.pid == os.getpid():
+            self._writer.close()
+        self._writer = None
+
+        connections = getattr(_pool, 'connections', {})
+        con = connections.pop(self.path, None)
+        if con is not None:
+            con.commit()
+            con.close()
 
     def clear_tables(self, tables=['results', 'actions', 'Q']):
+        self._sync()
         with self.connection as con:
             for table in tables:
                 try:
@@ -69,131 +239,106 @@ class DB():
                 except sqlite3.OperationalError as e:
                     print(e)
 
-    def log_action(self, phase, state, action, decision, round_no):
+    def delete_rounds(self, first_round):
+        '''
+        Deletes the logged actions and results of the rounds from
+        `first_round` on, eg. the rounds played after a checkpoint.
+        '''
+        self._sync()
         with self.connection as con:
-            con.execute('INSERT INTO actions VALUES (?,?,?,?,?)',
-                        (phase, state, action, decision, round_no))
+            for table in ['results', 'actions']:
+                con.execute('DELETE FROM {} WHERE round_no >= ?'.format(table),
+                            (first_round,))
 
-    def max_Q(self, state, keys=None):
+    def log_action(self, phase, state, action, decision, round_no):
+        self._write_many(INSERT_ACTION,
+                         [(phase, state, action, decision, round_no)])
+
+    def log_action_rows(self, rows):
+        '''
+        Inserts many (phase, state, action, decision, round_no) rows into
+        the actions table with a single statement.
+        '''
+        self._write_many(INSERT_ACTION, rows)
+
+    def _Q_values(self, state, keys=None):
+        '''
+        Returns the Q values of a state as a dict by action, limited to
+        the actions in `keys` if given. It is one constant statement
+        whatever the keys are, so it is always prepared only once.
+        '''
+        cursor = self.connection.execute(SELECT_STATE_Q, (state,))
         if keys is None:
-            query = '''
-                SELECT
-                    state, MAX(value)
-                FROM Q
-                WHERE
-                    state = ?
-                GROUP BY state
-            '''
-            args = (state, )
-        else:
-            seq = ','.join(['?'] * len(keys))
-            query = '''
-                SELECT
-                    state, MAX(value)
-                FROM Q
-                WHERE
-                    state = ? AND
-                    action IN ({})
-                GROUP BY state
-            '''.format(seq)
-            args = (state, *keys)
-
-        with self.connection as con:            
-            cursor = con.execute(query, args)
-
-            _, max_Q = cursor.fetchone()
-        
-        return max_Q
+            return dict(cursor.fetchall())
+
+        return {action: value for action, value in cursor.fetchall()
+                if action in keys}
+
+    def max_Q(self, state, keys=None):
+        values = self._Q_values(state, keys)
+
+        return max(values.values()) if values else None
 
     def init_Q(self, state, actions):
-        with self.connection as con:
-            cursor = con.execute('''
-                SELECT
-                    state, action, value
-                FROM Q
-                WHERE state = ?
-            ''', (state,))
-
-            if cursor.fetchone() is None:
-                for action in actions:
-                    con.execute('INSERT INTO Q VALUES (?, ?, 0)', (state, action))
-            
+        args = [arg for action in actions for arg in (state, action)]
+        self.connection.execute(_insert_Q(len(actions)), args)
+
     def check_stateQ(self, state):
-        with self.connection as con:
-            cursor = con.execute('''
-                SELECT state 
-                FROM Q 
-                WHERE
-                    state = ?
-            ''', (state,))
-            
-            return bool(cursor.fetchone())
-    
-    def get_Q_value(self, state, action):
-        with self.connection as con:
-            cursor = con.execute('''
-                SELECT 
-                    state, action, value 
-                FROM Q
-                WHERE
-                    state = ? AND
-                    action = ?
-            ''', (state, action))
-
-            result = cursor.fetchone()
-            if result is not None:
-                _, _, value = result
-                return value
-            else:
-                return None
+        cursor = self.connection.execute(CHECK_STATE_Q, (state,))
 
-    def argmax_Q(self, state, keys=None):
-        max_Q = self.max_Q(state, keys)
+        return cursor.fetchone() is not None
 
-        if keys is None:
-            query = '''
-                SELECT state, action, value
-                FROM Q
-                WHERE
-                    value = ? AND
-                    state = ?
-            '''
-            args = (max_Q, state)
+    def get_Q_value(self, state, action):
+        cursor = self.connection.execute(SELECT_Q, (state, action))
+
+        result = cursor.fetchone()
+        if result is not None:
+            return result[0]
         else:
-            seq = ','.join(['?'] * len(keys))
-            query = '''
-                SELECT state, action, value
-                FROM Q
-                WHERE
-                    value = ? AND
-                    state = ? AND
-                    action IN ({})
-            '''.format(seq)
-            args = (max_Q, state, *keys)
+            return None
 
-        with self.connection as con:
-            cursor = con.execute(query, args)
+    def argmax_Q(self, state, keys=None):
+        values = self._Q_values(state, keys)
+        if not values:
+            return []
 
-            all_records = cursor.fetchall()
-            if all_records is not None:
-                return [action for s, action, v in all_records]
-            else:
-                return None
+        max_Q = max(values.values())
+        return [action for action, value in values.items()
+                if value == max_Q]
 
     def set_Q(self, state, action, value):
+        self.connection.execute(UPDATE_Q, (value, state, action))
+
+    def set_many_Q(self, rows):
+        '''
+        Inserts or overwrites many Q values in one transaction.
+
+        Args:
+        `rows`: iterable of (state, action, value) tuples
+        '''
+        if self.async_writes:
+            self._write_many(UPSERT_Q, rows)
+            return
+
         with self.connection as con:
-            con.execute('''
-                UPDATE Q 
-                SET value = ? 
-                WHERE 
-                    state = ? AND
-                    action = ?
-            ''', (value, state, action))
+            con.executemany(UPSERT_Q, rows)
+
+    def load_Q(self):
+        '''
+        Returns all rows of the Q table as a list of (state, action,
+        value) tuples.
+        '''
+        self._sync()
+        cursor = self.connection.execute('SELECT state, action, value FROM Q')
+
+        return cursor.fetchall()
 
     def get_full_Q(self):
+        import pandas as pd
+
+        self._sync()
         with self.connection as con:
-            q = pd.read_sql(
-                'SELECT state as "state [state]", action, value FROM Q', con)
+            q = pd.read_sql('SELECT state, action, value FROM Q', con)
 
         return q
 
@@ -204,26 +349,41 @@ class DB():
         else:
             phase = 'Testing'
         
-        with self.connection as con:
-            con.execute('INSERT INTO results VALUES (?,?,?,?)',
-                        (phase, final_state, reward, round_no))
-
-    def export_test_results(self):
+        self._write_many(INSERT_RESULT,
+                         [(phase, final_state, reward, round_no)])
+
+    def log_result_rows(self, rows):
+        '''
+        Inserts many (phase, state, result, round_no) rows into the
+        results table with a single statement.
+        '''
+        self._write_many(INSERT_RESULT, rows)
+
+    def export_test_results(self, fmt='csv', rounds=None):
+        '''
+        Exports the results of the testing phase into
+        results/test_results_{timestamp}.{fmt} with
+        `blackjack.export.ResultExporter`.
+
+        Args:
+        -----
+        `fmt`: (str): file format, see `blackjack.export.EXPORT_FORMATS`
+        (default='csv')
+
+        `rounds`: (first, last) range of round numbers, both included
+        (default: every round)
+
+        Returns: (str): path of the exported file
+        '''
         try:
             os.mkdir('results')
         except FileExistsError:
             pass
 
-        with self.connection as con:
-            cursor = con.execute(
-                'SELECT * FROM results WHERE phase = "Testing"')
-        
-            ts = datetime.now().timestamp()
-            with open('results/test_results_{}.csv'.format(ts), 'w') as file:
-                headers = ['phase', 'state', 'result', 'round_no']
-                file.write(';'.join(headers))
-                file.write('\n')
-
-                for row in cursor:
-                    file.write(';'.join([str(item) for item in row]))
-                    file.write('\n')
+        self._sync()
+        ts = datetime.now().timestamp()
+        path, _ = ResultExporter(self).export(
+            'results/test_results_{}.{}'.format(ts, fmt), fmt=fmt,
+            phase='Testing', rounds=rounds)
+
+        return path
@@ -1,4 +1,5 @@
-from blackjack.deck import Deck
+from blackjack.deck import CARD_VALUES, Deck, Shoe
+from blackjack.state import encode_state
 
 
 class Dealer:
@@ -7,44 +8,77 @@ class Dealer:
     the game from initial dealing through dealing additional cards to 
     monitoring hand values and logging the results.
 
+    The values of the hands are kept up to date as cards are dealt: every
+    hand has a running total (aces counted as 1) and a flag showing
+    whether it holds an ace, so dealing a card costs a table lookup, and
+    `player_value` and `house_value` are plain attributes for the round.
+
     Args:  
-    `player`: blackjack.Player instance to interact with.
+    `player`: blackjack.Player instance to interact with.  
+    `n_decks`: number of decks in a `blackjack.deck.Shoe`, which is only
+    reshuffled at the cut card. If None, a single `blackjack.deck.Deck`
+    is reshuffled before every round (default=None)  
+    `penetration`: share of the shoe dealt before reshuffling, the cut
+    card always leaves room for a full round (see `blackjack.deck.Shoe`)
+    (default=0.75)  
+    `rng`: `blackjack.rng.RNG` shuffling the deck (default: the `rng` of
+    the player, so one seed drives the whole game)
     '''
 
-    def __init__(self, player, **kwargs):
+    def __init__(self, player, n_decks=None, penetration=0.75, rng=None,
+                 **kwargs):
         self.player = player
-        self.deck = Deck()
+        self.rng = rng or getattr(player, 'rng', None)
+        if n_decks is None:
+            self.deck = Deck(rng=self.rng)
+        else:
+            self.deck = Shoe(n_decks=n_decks, penetration=penetration,
+                             rng=self.rng)
         self.options = ['stand', 'hit']
+        self.totals = {'player': (0, False), 'house': (0, False)}
 
     def deal_starting_hands(self):
         '''
-        Reshuffle deck and deal 2 cards for player and one card for house.
+        Reshuffle deck (if needed) and deal 2 cards for player and one card
+        for house.
 
         Returns: self
         '''
-        self.deck.reshuffle()
+        if self.deck.needs_shuffle:
+            self.deck.reshuffle()
         self.player_cards = self.deck.deal(n_cards=2)
         self.house_cards = self.deck.deal(n_cards=1)
+
+        self.totals = {'player': (0, False), 'house': (0, False)}
+        self._count_cards('player', self.player_cards)
+        self._count_cards('house', self.house_cards)
         
         return self
 
-    @property
-    def player_value(self):
+    def _count_cards(self, which_hand, cards):
         '''
-        Returns the current value of player cards.
+        Adds new cards to the running total of a hand and updates the
+        `player_value` or `house_value` attribute.
 
-        Returns: (int): the current value
+        Params:  
+        `which_hand`: (str): 'player' or 'house'  
+        `cards`: list(str): the cards added to the hand
         '''
-        return self.evaluate_cards(self.player_cards)
+        total, has_ace = self.totals[which_hand]
+        for card in cards:
+            total += CARD_VALUES[card[0]]
+            has_ace = has_ace or card[0] == 'A'
 
-    @property
-    def house_value(self):
-        '''
-        Returns the current value of house cards.
+        self.totals[which_hand] = (total, has_ace)
 
-        Returns: (int): the current value
-        '''
-        return self.evaluate_cards(self.house_cards)
+        # Check if one of the Aces can be counted as 11
+        if has_ace and total <= 11:
+            total += 10
+
+        if which_hand == 'player':
+            self.player_value = total
+        else:
+            self.house_value = total
 
     @staticmethod
     def evaluate_cards(hand):
@@ -58,24 +92,11 @@ class Dealer:
 
         Returns: (int): the current value of the hand.
         '''
-        aces = [card for card in hand if card[0] == 'A']
-        non_aces = [card for card in hand if card[0] != 'A']
-
-        # All Aces count as 1
-        value = len(aces)
-
-        # Count non-aces
-        for card in non_aces:
-            try:
-                card_value = int(card[0])
-            except ValueError:
-                card_value = 10
-
-            value += card_value
+        value = sum([CARD_VALUES[card[0]] for card in hand])
         
         # Check if one of the Aces can be counted as 11
-        if len(aces) > 0 and value <= 11:
-                value += 10
+        if value <= 11 and any([card[0] == 'A' for card in hand]):
+            value += 10
 
         return value        
 
@@ -108,24 +129,20 @@ class Dealer:
     @property
     def game_state(self):
         '''
-        Creates ((P1, P2, ...), H) tuple, where P1, P2, ... are the
-        player's cards ranks, while H is the rank of the open card
-        of the house. The tuple represents the current state of the game,
-        which is needed by the learning agent.
+        Creates the integer key of the current state of the game, which
+        is needed by the learning agent. The key encodes the count of
+        each rank in the player's hand and the rank of the open card of
+        the house (see `blackjack.state.encode_state`), eg. the player
+        holding 'Ad' and '4c' against 'Ks' of the house gives the same key
+        as `encode_state(['A', '4'], 'K')`.
 
         Note: the suit of the cards is stripped as it is not necessary
         for computing the hand values and bloats state space for the
         learner.
 
-        Returns: (tuple): state of the game, eg. (('A', '4'), 'K')
+        Returns: (int): state of the game
         '''
-
-        player_cards = [card[0] for card in sorted(self.player_cards)]
-        house_card = [card[0] for card in self.house_cards][0]
-
-        state = (tuple(player_cards), house_card)
-
-        return state
+        return encode_state(self.player_cards, self.house_cards[0])
 
     @property
     def player_action(self):
@@ -156,6 +173,8 @@ class Dealer:
         else:
             self.house_cards.extend(new_card)
 
+        self._count_cards(which_hand, new_card)
+
     def run_game(self):
         '''
         Runs one round of blackjack game with player:
@@ -166,7 +185,7 @@ class Dealer:
         4. Evaluate game and give reward to player
         5. Log results
 
-        Returns: None
+        Returns: (int): the reward of the round
         '''
         self.deal_starting_hands()
        
@@ -180,4 +199,7 @@ class Dealer:
             while self.house_value < 17:
                 self.hit_hand('house')
 
-        self.player.set_reward(self.reward, self.game_state)
+        reward = self.reward
+        self.player.set_reward(reward, self.game_state)
+
+        return reward
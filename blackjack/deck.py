@@ -1,11 +1,19 @@
-import random
+from array import array
+from blackjack.rng import RNG
 
 CARD_RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
 '''Possible card ranks for generating a deck'''
 
+CARD_VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9,
+               'T': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 1}
+'''Blackjack value of the card ranks (aces counted as 1)'''
+
 SUITS = ['c', 'd', 'h', 's']
 '''Abreviations for the 4 card suits: clubs, diamonds, hearts and spades'''
 
+CARDS = ['{}{}'.format(face, suit) for suit in SUITS for face in CARD_RANKS]
+'''The 52 cards of a deck, the integer code of a card is its index'''
+
 
 class DeckException(Exception):
     '''Custom exception for `blackjack.Deck` class.'''
@@ -17,9 +25,18 @@ class Deck:
     Class defining a deck of playing cards with necessary methods to deal
     and (re)shuffle cards and track what cards had been dealt. Initializes 
     a shuffled state.
+
+    Args:
+    -----
+    `rng`: (blackjack.rng.RNG): random source of the shuffles
+    (default: new unseeded `RNG`)
     '''
 
-    def __init__(self):
+    needs_shuffle = True
+    '''A single deck is reshuffled before every round'''
+
+    def __init__(self, rng=None):
+        self.rng = rng or RNG()
         self.reshuffle()
 
     def _generate(self):
@@ -29,12 +46,7 @@ class Deck:
         Returns: list(str): list of cards in the form of 'As', '4c', etc.
         '''
 
-        new_deck = []
-        for suit in SUITS:
-            for face in CARD_RANKS:
-                new_deck.append('{}{}'.format(face, suit))
-
-        return new_deck
+        return list(CARDS)
 
     def shuffle(self):
         '''
@@ -43,7 +55,7 @@ class Deck:
         Returns: self
         '''
 
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
         return self
 
     def reshuffle(self):
@@ -78,3 +90,102 @@ class Deck:
         self.dealt.extend(dealt_cards)
 
         return dealt_cards
+
+
+def round_cards(values):
+    '''
+    Upper bound of the number of cards one round can use from a shoe:
+    the player hits while the hand is under 21 and the house while it is
+    under 17, so each hand takes at most as many of the lowest cards as
+    fit into 20 (or 16) counting aces as 1, plus the last card.
+
+    Args:
+    -----
+    `values`: list(int): blackjack values of the cards in the shoe
+
+    Returns: (int)
+    '''
+    bound = 0
+    for limit in [20, 16]:
+        total = 0
+        for value in sorted(values):
+            if total + value > limit:
+                break
+            total += value
+            bound += 1
+        bound += 1
+
+    return bound
+
+
+class Shoe:
+    '''
+    Class defining a shoe of several decks for dealing many rounds
+    without reshuffling. The cards are stored as a compact array of
+    integer card codes (indices of `CARDS`), dealing only advances a
+    position in it, and the shoe is reshuffled when the cut card is
+    reached. Initializes a shuffled state.
+
+    The cut card is placed at most `round_cards` before the end of the
+    shoe, so a round started before the cut card never runs out of
+    cards, even with `penetration=1`.
+
+    Args:
+    -----
+    `n_decks`: (int): number of decks in the shoe (default=6)
+
+    `penetration`: (float): share of the cards dealt before the cut card
+    is reached. Should be in (0-1] (default=0.75)
+
+    `rng`: (blackjack.rng.RNG): random source of the shuffles
+    (default: new unseeded `RNG`)
+    '''
+
+    def __init__(self, n_decks=6, penetration=0.75, rng=None):
+        assert n_decks > 0, 'n_decks has to be greater than 0'
+        assert 0 < penetration <= 1, 'penetration has to be in (0-1]'
+
+        self.rng = rng or RNG()
+
+        self.cards = array('B', range(len(CARDS))) * n_decks
+        reserve = round_cards([CARD_VALUES[CARDS[code][0]]
+                               for code in self.cards])
+        self.cut = min(int(len(self.cards) * penetration),
+                       len(self.cards) - reserve)
+        self.reshuffle()
+
+    @property
+    def needs_shuffle(self):
+        '''
+        Returns True when the cut card has been reached.
+        '''
+        return self.position >= self.cut
+
+    def reshuffle(self):
+        '''
+        Shuffle all cards back into the shoe.
+
+        Returns: self
+        '''
+        self.rng.shuffle(self.cards)
+        self.position = 0
+        return self
+
+    def deal(self, n_cards=1):
+        '''
+        Gets the next n cards of the shoe and returns them in a list.
+
+        Returns: list(str): list of cards in the form of 'As', '4c', etc.
+        '''
+        assert n_cards > 0, 'n_cards has to be greater than 0'
+
+        end = self.position + n_cards
+        if end > len(self.cards):
+            raise DeckException('Shoe is shorter ({}) than needed ({})'
+                                .format(len(self.cards) - self.position,
+                                        n_cards))
+
+        dealt_cards = [CARDS[code] for code in self.cards[self.position:end]]
+        self.position = end
+
+        return dealt_cards
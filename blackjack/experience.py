@@ -0,0 +1,170 @@
+import numpy as np
+from blackjack.rng import RNG
+
+
+class ReplayBuffer:
+    '''
+    Experience replay over a `blackjack.qstore.ArrayQStore`. Every
+    (state, action, reward, next_state) transition of the rounds is
+    stored in a ring of `capacity` transitions as dense state indices and
+    action columns, and the Q values are updated in vectorized batches:
+    the new transitions once `batch_size` of them are collected, followed
+    by `replay_batches` batches sampled uniformly from the whole ring.
+
+    The targets of a batch are computed from the Q values before the
+    batch (`reward + gamma * max Q(next_state)`, or the reward alone for
+    the last transition of a round). Transitions of the same
+    (state, action) pair in a batch are collapsed: their targets are
+    summed with one scatter-add and the pair gets `count` updates
+    towards the mean target at once, ie. the old value is weighted by
+    `(1 - alpha) ** count`, which equals `count` sequential updates when
+    the targets agree.
+
+    Args:
+    -----
+    `store`: (blackjack.qstore.ArrayQStore): the Q values to update
+
+    `capacity`: (int): number of transitions kept (default=100000)
+
+    `batch_size`: (int): number of transitions in a batch (default=256)
+
+    `replay_batches`: (int): number of sampled batches replayed after
+    the new transitions (default=1)
+
+    `rng`: (blackjack.rng.RNG): random stream of the sampling
+    (default: new unseeded `RNG`)
+    '''
+
+    def __init__(self, store, capacity=100000, batch_size=256,
+                 replay_batches=1, rng=None):
+        self.store = store
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.replay_batches = replay_batches
+        self.rng = rng or RNG()
+
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.full(capacity, -1, dtype=np.int64)
+        self.size = 0
+        self.position = 0
+        self.new = []
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def pending(self):
+        '''
+        Number of transitions added since the last replay.
+        '''
+        return len(self.new)
+
+    @property
+    def ready(self):
+        '''
+        True when a full batch of new transitions is waiting.
+        '''
+        return len(self.new) >= self.batch_size
+
+    def add(self, state, action, reward, next_state=None):
+        '''
+        Stores a transition.
+
+        Args:
+        -----
+        `state`, `next_state`: integer state keys, `next_state` is None
+        for the last transition of a round
+
+        `action`: (str): one of the actions of the store
+
+        `reward`: the reward of the transition
+        '''
+        self.new.append((state, self.store.columns[action], reward,
+                         -1 if next_state is None else next_state))
+
+    def _store_new(self):
+        '''
+        Moves the new transitions into the ring.
+
+        Returns: (np.ndarray): their indices in the ring
+        '''
+        new = self.new[-self.capacity:]
+
+        states, actions, rewards, next_states = zip(*new)
+        space = self.store.space
+        states = space.index_of(states)
+        next_states = np.asarray(next_states, dtype=np.int64)
+        live = next_states >= 0
+        next_states[live] = space.index_of(next_states[live])
+        if (states < 0).any() or (next_states[live] < 0).any():
+            raise KeyError('transitions of states outside of the state space')
+
+        self.new = []
+
+        indices = (self.position + np.arange(len(new))) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+
+        self.position = (self.position + len(new)) % self.capacity
+        self.size = min(self.size + len(new), self.capacity)
+
+        return indices
+
+    def update(self, alpha, gamma, indices):
+        '''
+        Applies one batched update of the transitions at `indices` of
+        the ring.
+
+        Returns: (int): number of distinct (state, action) pairs updated
+        '''
+        store = self.store
+        values = store.values
+        n_actions = values.shape[1]
+
+        states = self.states[indices]
+        next_states = self.next_states[indices]
+        targets = self.rewards[indices].copy()
+        live = next_states >= 0
+        targets[live] += gamma * values[next_states[live]].max(axis=1)
+
+        pairs, inverse, counts = np.unique(
+            states * n_actions + self.actions[indices],
+            return_inverse=True, return_counts=True)
+        # scatter-add of the targets of the duplicate pairs
+        sums = np.bincount(inverse, weights=targets, minlength=len(pairs))
+        rows, columns = np.divmod(pairs, n_actions)
+
+        kept = (1 - alpha) ** counts
+        values[rows, columns] = kept * values[rows, columns] + \
+            (1 - kept) * sums / counts
+
+        store.seen[rows] = True
+        store.dirty[rows] = True
+        store.visit_counts[rows, columns] += counts
+
+        return len(pairs)
+
+    def replay(self, alpha, gamma):
+        '''
+        Updates the Q values with the new transitions (in batches of
+        `batch_size`), then with `replay_batches` sampled batches.
+
+        Returns: (int): number of transitions used
+        '''
+        new = self._store_new() if self.new else []
+        if self.size == 0:
+            return 0
+
+        for start in range(0, len(new), self.batch_size):
+            self.update(alpha, gamma, new[start:start + self.batch_size])
+
+        for _ in range(self.replay_batches):
+            self.update(alpha, gamma, self.rng.generator.integers(
+                0, self.size, min(self.batch_size, self.size)))
+
+        return len(new) + self.replay_batches * min(self.batch_size,
+                                                    self.size)
@@ -0,0 +1,213 @@
+import numpy as np
+from blackjack.state import decode_state
+
+EXPORT_FORMATS = ['csv', 'parquet', 'feather', 'npy']
+
+RESULT_COLUMNS = ['phase', 'state', 'result', 'round_no']
+
+RESULT_DTYPE = np.dtype([('phase', 'U8'), ('state', 'i8'), ('result', 'i4'),
+                         ('round_no', 'i8')])
+'''Record type of the columnar exports'''
+
+
+class ExportException(Exception):
+    pass
+
+
+def _import_pyarrow():
+    '''
+    Imports pyarrow on first use.
+
+    Returns: the pyarrow module, or None if it is not installed
+    '''
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+
+    return pyarrow
+
+
+class ResultExporter:
+    '''
+    Streams rows of the results table into a file. Rows are fetched from
+    the database in chunks of `chunk_size` and written out chunk by
+    chunk, so memory use does not depend on the number of rows.
+
+    CSV files have the `;` separated layout of the original test result
+    exports with decoded states (see `blackjack.state.decode_state`).
+    Columnar formats keep the integer state keys: Parquet and Feather
+    files are written with pyarrow when it is installed, otherwise the
+    rows go into a `.npy` file of `RESULT_DTYPE` records.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database holding the results table
+
+    `chunk_size`: (int): number of rows fetched at once (default=100000)
+    '''
+
+    def __init__(self, db, chunk_size=100000):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def _where(self, phase=None, rounds=None):
+        conditions, params = [], []
+        if phase is not None:
+            conditions.append('phase = ?')
+            params.append(phase)
+        if rounds is not None:
+            conditions.append('round_no BETWEEN ? AND ?')
+            params.extend(rounds)
+
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return where, params
+
+    def count(self, phase=None, rounds=None):
+        '''
+        Returns the number of rows matching the filters.
+        '''
+        where, params = self._where(phase, rounds)
+        cursor = self.db.connection.execute(
+            'SELECT COUNT(*) FROM results' + where, params)
+
+        return cursor.fetchone()[0]
+
+    def chunks(self, phase=None, rounds=None):
+        '''
+        Yields the matching (phase, state, result, round_no) rows in lists
+        of at most `chunk_size` rows, in the order of the rounds.
+
+        Args:
+        -----
+        `phase`: (str): 'Training' or 'Testing' (default: both)
+
+        `rounds`: (first, last) range of round numbers, both included
+        (default: every round)
+        '''
+        where, params = self._where(phase, rounds)
+        cursor = self.db.connection.execute(
+            'SELECT phase, state, result, round_no FROM results' + where +
+            ' ORDER BY round_no', params)
+
+        try:
+            rows = cursor.fetchmany(self.chunk_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(self.chunk_size)
+        finally:
+            cursor.close()
+
+    def to_csv(self, path, phase=None, rounds=None):
+        '''
+        Writes the matching rows into a CSV file.
+
+        Returns: (int): number of rows written
+        '''
+        decoded = {}
+        n_rows = 0
+        with open(path, 'w') as file:
+            file.write(';'.join(RESULT_COLUMNS) + '\n')
+
+            for rows in self.chunks(phase, rounds):
+                for state in {row[1] for row in rows} - decoded.keys():
+                    decoded[state] = str(decode_state(state))
+
+                file.write(''.join(
+                    ['{};{};{};{}\n'.format(phase, decoded[state], result,
+                                             round_no)
+                     for phase, state, result, round_no in rows]))
+                n_rows += len(rows)
+
+        return n_rows
+
+    def to_npy(self, path, phase=None, rounds=None):
+        '''
+        Writes the matching rows into a `.npy` file of `RESULT_DTYPE`
+        records, which is preallocated on disk and filled chunk by chunk.
+
+        Returns: (int): number of rows written
+        '''
+        n_rows = self.count(phase, rounds)
+        records = np.lib.format.open_memmap(path, mode='w+',
+                                            dtype=RESULT_DTYPE,
+                                            shape=(n_rows,))
+        written = 0
+        for rows in self.chunks(phase, rounds):
+            records[written:written + len(rows)] = rows
+            written += len(rows)
+
+        records.flush()
+        del records
+
+        return written
+
+    def to_arrow(self, path, fmt, phase=None, rounds=None):
+        '''
+        Writes the matching rows into a Parquet or Feather file with
+        pyarrow, one row group or record batch per chunk.
+
+        Returns: (int): number of rows written
+        '''
+        pyarrow = _import_pyarrow()
+        if pyarrow is None:
+            raise ExportException('pyarrow is needed for {} export'.format(fmt))
+
+        schema = pyarrow.schema([('phase', pyarrow.string()),
+                                 ('state', pyarrow.int64()),
+                                 ('result', pyarrow.int32()),
+                                 ('round_no', pyarrow.int64())])
+        if fmt == 'parquet':
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(path, schema)
+
+        n_rows = 0
+        with writer:
+            for rows in self.chunks(phase, rounds):
+                columns = [pyarrow.array(column, type=field.type)
+                           for column, field in zip(zip(*rows), schema)]
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                    columns, schema=schema))
+                n_rows += len(rows)
+
+        return n_rows
+
+    def export(self, path, fmt=None, phase=None, rounds=None):
+        '''
+        Writes the matching rows into `path`.
+
+        Args:
+        -----
+        `path`: (str): path of the file
+
+        `fmt`: (str): one of `EXPORT_FORMATS` (default: the extension of
+        `path`). Parquet and Feather fall back to `.npy` when pyarrow is
+        not installed.
+
+        `phase`: (str): 'Training' or 'Testing' (default: both)
+
+        `rounds`: (first, last) range of round numbers, both included
+        (default: every round)
+
+        Returns: (path, n_rows): the path actually written (the extension
+        changes on fallback) and the number of rows
+        '''
+        fmt = fmt or path.rsplit('.', 1)[-1]
+        if fmt not in EXPORT_FORMATS:
+            raise ExportException('Unknown export format: {}'.format(fmt))
+
+        if fmt in ['parquet', 'feather'] and _import_pyarrow() is None:
+            fmt = 'npy'
+            path = path.rsplit('.', 1)[0] + '.npy'
+
+        if fmt == 'csv':
+            n_rows = self.to_csv(path, phase, rounds)
+        elif fmt == 'npy':
+            n_rows = self.to_npy(path, phase, rounds)
+        else:
+            n_rows = self.to_arrow(path, fmt, phase, rounds)
+
+        return path, n_rows
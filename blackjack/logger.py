@@ -0,0 +1,92 @@
+from blackjack.db import DB
+
+LOG_LEVELS = ['full', 'results', 'sampled', 'off']
+'''
+Possible logging levels:
+`full`: every action and every result is logged,
+`results`: only the results of the rounds are logged,
+`sampled`: actions and results of every `sample_rounds`-th round,
+`off`: nothing is logged.
+'''
+
+
+class Logger:
+    '''
+    Buffered logger for the actions and results of the rounds. Rows are
+    kept in memory and written into the `actions` and `results` tables
+    with bulk inserts when the buffer is full or `flush` is called.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database to write the rows into
+    (default: new `DB()`, unless `sink` is given)
+
+    `level`: (str): one of `LOG_LEVELS` (default='full')
+
+    `sample_rounds`: (int): with 'sampled' level only every
+    `sample_rounds`-th round is logged (default=100)
+
+    `buffer_size`: (int): number of buffered rows that triggers writing
+    into the database (default=1000)
+
+    `sink`: object receiving the rows instead of the database, with
+    `log_action_rows`, `log_result_rows` and `flush` methods, eg.
+    `blackjack.replay.ReplayWriter` (default=None)
+    '''
+
+    def __init__(self, db=None, level='full', sample_rounds=100,
+                 buffer_size=1000, sink=None):
+        assert level in LOG_LEVELS, \
+            'level has to be one of {}'.format(LOG_LEVELS)
+
+        if db is None and sink is None:
+            db = DB()
+        self.db = db
+        self.level = level
+        self.sample_rounds = sample_rounds
+        self.buffer_size = buffer_size
+        self.sink = sink
+        self.actions = []
+        self.results = []
+
+    def _sampled(self, round_no):
+        return self.level == 'sampled' and round_no % self.sample_rounds == 0
+
+    def log_action(self, phase, state, action, decision, round_no):
+        '''
+        Buffers an action row if the level requires it.
+        '''
+        if self.level == 'full' or self._sampled(round_no):
+            self.actions.append((phase, state, action, decision, round_no))
+            if len(self.actions) >= self.buffer_size:
+                self.flush()
+
+    def log_results(self, training, final_state, reward, round_no):
+        '''
+        Buffers a result row if the level requires it.
+        '''
+        if self.level in ['full', 'results'] or self._sampled(round_no):
+            phase = 'Training' if training else 'Testing'
+            self.results.append((phase, final_state, reward, round_no))
+            if len(self.results) >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        '''
+        Writes the buffered rows into the database (or the sink).
+
+        Returns: self
+        '''
+        target = self.sink or self.db
+        if self.actions:
+            target.log_action_rows(self.actions)
+            self.actions = []
+
+        if self.results:
+            target.log_result_rows(self.results)
+            self.results = []
+
+        if self.sink:
+            self.sink.flush()
+
+        return self
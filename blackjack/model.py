@@ -1,13 +1,10 @@
 import os
-from collections import Counter
-from sklearn.pipeline import Pipeline
-from sklearn.decomposition import PCA
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import precision_score, f1_score
-import pandas as pd
+import numpy as np
 import pickle
 from blackjack.db import DB
+from blackjack.deck import CARD_RANKS
+from blackjack.state import (HOUSE_BITS, RANK_MASKS, RANK_SHIFTS,
+                             reachable_states)
 
 
 COLUMNS = ['2_pl',
@@ -37,77 +34,186 @@ COLUMNS = ['2_pl',
            'Q_ho',
            'T_ho']
 
+FEATURE_RANKS = [col[0] for col in COLUMNS[:13]]
+'''Card ranks in the order of the player and house columns'''
+
+_SHIFTS = np.array([RANK_SHIFTS[rank] for rank in FEATURE_RANKS])
+_MASKS = np.array([RANK_MASKS[rank] for rank in FEATURE_RANKS])
+_HOUSE_COLUMNS = np.array([len(FEATURE_RANKS) + FEATURE_RANKS.index(rank)
+                           for rank in CARD_RANKS])
+
+
+def encode_features(states):
+    '''
+    Transforms state keys into the feature matrix of the model, with
+    columns in `COLUMNS` order: the count of each rank in the player's
+    hand followed by the one-hot encoded rank of the house upcard. The
+    counts are extracted from the keys with vectorized bit operations.
+
+    Args:
+    ----
+    `states`: sequence of state keys (see `blackjack.state.encode_state`)
+
+    Returns:
+    -------
+    (np.ndarray): feature matrix of shape (len(states), len(COLUMNS))
+    '''
+    states = np.asarray(states, dtype=np.int64)
+    features = np.zeros((len(states), len(COLUMNS)))
+
+    features[:, :len(FEATURE_RANKS)] = (states[:, None] >> _SHIFTS) & _MASKS
+    houses = _HOUSE_COLUMNS[states & ((1 << HOUSE_BITS) - 1)]
+    features[np.arange(len(states)), houses] = 1
+
+    return features
+
 
 class ModelException(Exception):
     pass
 
 
-default_model = Pipeline([
-    ('pca', PCA(n_components=10)),
-    ('clf', RandomForestClassifier(n_estimators=30,
-                                   min_samples_split=60,
-                                   min_samples_leaf=30,
-                                   max_depth=10))])
+def make_default_model():
+    '''
+    Creates the default estimator: a PCA and random forest pipeline.
+    scikit-learn is imported here, on first use, so importing the
+    package does not pay for it.
+    '''
+    from sklearn.pipeline import Pipeline
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import RandomForestClassifier
+
+    return Pipeline([
+        ('pca', PCA(n_components=10)),
+        ('clf', RandomForestClassifier(n_estimators=30,
+                                       min_samples_split=60,
+                                       min_samples_leaf=30,
+                                       max_depth=10))])
+
+
+def __getattr__(name):
+    # `default_model` used to be built at import time
+    if name == 'default_model':
+        return make_default_model()
+
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 class Model:
     '''
     Class for training and using a model based on learned Q values.
+
+    Args:
+    -----
+    `model`: scikit-learn estimator to train (default: PCA and random
+    forest pipeline of `make_default_model`, created on first use)
+
+    `db`: (blackjack.db.DB): database holding the Q table
+    (default: `DB()`)
+
+    Properties
+    ----------
+    `policy`: dict(state: int): predicted labels of every reachable
+    state, compiled after training (see `compile_policy`)
     '''
     trained = False
 
-    def __init__(self, model=None):
-        self.db = DB()
-        if model:
-            self.model = model
-        else:
-            self.model = default_model
+    def __init__(self, model=None, db=None):
+        self.db = db or DB()
+        self.policy = {}
+        self._states = np.array([], dtype=np.int64)
+        self._values = np.empty((0, 2))
+        self._features = np.empty((0, len(COLUMNS)))
+        self._labelled = np.array([], dtype=np.int64)
+        self._model = model
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = make_default_model()
+
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
 
     def _load_data(self):
         '''
         Loads Q data from database and transforms it into features and
         labels for training the model (the model is trained on all
-        available Q data).
-        '''
-        q = self.db.get_full_Q()
-
-        states = q.groupby(['state', 'action']).sum().unstack()
-
-        players = [Counter(p) for ((p, h), (hit, stand))
-                   in states.iterrows() if hit != stand]
-        houses = [Counter(h) for ((p, h), (hit, stand))
-                in states.iterrows() if hit != stand]
-        labels = [int(hit > stand) for ((p, h), (hit, stand))
-                in states.iterrows() if hit != stand]
-
-        data = pd.concat([pd.DataFrame.from_dict(players).fillna(0),
-                        pd.DataFrame.from_dict(houses).fillna(0),
-                        pd.Series(labels, name='label')],
-                        axis=1)
+        available Q data, states with equal Q values are left out).
 
-        data.columns = COLUMNS + ['labels']
+        Features and Q values of the previous load are cached by state,
+        so only states new since then are encoded, states whose Q values
+        changed are flagged in `self.changed`, and `self.dropped` counts
+        the labelled states of the previous load which were removed or
+        became tied since then.
 
-        self.features = data.iloc[:, :-1].values
-        self.labels = data['labels'].values
+        Returns: (int): number of labelled states that changed or were
+        dropped
+        '''
+        values = {}
+        for state, action, value in self.db.load_Q():
+            values.setdefault(state, {})[action] = value
+
+        states = np.array(sorted(values), dtype=np.int64)
+        q = np.array([[values[state].get('hit', 0),
+                       values[state].get('stand', 0)]
+                      for state in states.tolist()]).reshape(-1, 2)
+
+        features = np.empty((len(states), len(COLUMNS)))
+        known = np.zeros(len(states), dtype=bool)
+        changed = np.ones(len(states), dtype=bool)
+        if len(self._states) and len(states):
+            pos = np.searchsorted(self._states, states)
+            pos[pos == len(self._states)] = 0
+            known = self._states[pos] == states
+            features[known] = self._features[pos[known]]
+            changed[known] = (self._values[pos[known]] != q[known]).any(axis=1)
+
+        features[~known] = encode_features(states[~known])
+        self._states, self._values, self._features = states, q, features
+
+        labelled = q[:, 0] != q[:, 1]
+        self.dropped = len(np.setdiff1d(self._labelled, states[labelled],
+                                        assume_unique=True))
+        self._labelled = states[labelled]
+        self.features = features[labelled]
+        self.labels = (q[labelled, 0] > q[labelled, 1]).astype(int)
+        self.changed = changed[labelled]
+
+        return int(self.changed.sum()) + self.dropped
 
     def test_model(self):
         '''
         Make simple assessment on the model before training it on the 
         whole available Q data. Reports precision and f1-score after 
         making simple train-test split, and saves the results in a log
-        file.
+        file. The assessment is done on an unfitted copy of the model,
+        so the state of the model itself is left untouched.
         '''
+        from sklearn.base import clone
+        from sklearn.metrics import precision_score, f1_score
+        from sklearn.model_selection import train_test_split
+
         features_train, features_test, labels_train, labels_test = \
             train_test_split(self.features, self.labels, test_size=0.2)
 
-        self.model.fit(features_train, labels_train)
+        model = clone(self.model)
+        model.fit(features_train, labels_train)
         
-        train_predict = self.model.predict(features_train)
-        test_predict = self.model.predict(features_test)
+        train_predict = model.predict(features_train)
+        test_predict = model.predict(features_test)
 
         scoring_data = zip(['train', 'test'],
                            [labels_train, labels_test],
                            [train_predict, test_predict])
+        try:
+            os.mkdir('logs')
+        except FileExistsError:
+            pass
+
         try:
             os.remove('logs/model_scoring.txt')
         except FileNotFoundError:
@@ -125,22 +231,112 @@ class Model:
 
     def save_model(self):
         '''
-        Pickle the actual state of the model to model/model.pkl
+        Pickle the actual state of the model to model/model.pkl, and save
+        the compiled policy table to model/policy.npz
         '''
+        try:
+            os.mkdir('model')
+        except FileExistsError:
+            pass
+
         with open('model/model.pkl', 'bw') as model_file:
             pickle.dump(self.model, model_file)
 
-    def train(self):
+        states = np.array(list(self.policy), dtype=np.int64)
+        actions = np.array(list(self.policy.values()), dtype=np.int8)
+        np.savez('model/policy.npz', states=states, actions=actions)
+
+    def load_policy(self, path='model/policy.npz'):
         '''
-        Trains predictive model with the loaded features and labels.
-        Saves the fitted model in class property for later access.
+        Loads a policy table saved by `save_model`. The model counts as
+        trained afterwards, as long as only states of the table are
+        predicted.
+
+        Returns: the policy table
         '''
-        self._load_data()
-        self.test_model()
-        self.model.fit(self.features, self.labels)
+        with np.load(path) as data:
+            self.policy = dict(zip(data['states'].tolist(),
+                                   data['actions'].tolist()))
+
         self.trained = True
+        return self.policy
+
+    def compile_policy(self, states=None):
+        '''
+        Evaluates the trained model once over the given states and stores
+        the predictions in the `policy` table, so later predictions for
+        these states are simple lookups.
+
+        Args:
+        ----
+        `states`: sequence of state keys (default: every reachable state,
+        see `blackjack.state.reachable_states`)
+
+        Returns: the policy table
+        '''
+        if states is None:
+            states = reachable_states()
+
+        actions = self.predict_actions(states)
+        self.policy = dict(zip(states, actions.tolist()))
+
+        return self.policy
+
+    def train(self, validate=True):
+        '''
+        Trains predictive model with the loaded features and labels,
+        then compiles its predictions into the policy table. Saves the
+        fitted model in class property for later access.
+
+        Can be called again after the Q values changed: when nothing
+        changed since the last training the model is kept as it is,
+        estimators with `partial_fit` are only updated with the changed
+        states (unless labelled states were dropped), others are refitted
+        on all states (estimators with `warm_start` enabled continue from
+        their previous solution).
+
+        Args:
+        ----
+        `validate`: (bool): assess the model with `test_model` before
+        fitting it, skipped when there are too few states (default=True)
+
+        Raises ModelException when there are no states to train on or the
+        estimator cannot be fitted on them (eg. fewer states than the
+        PCA components of the default model).
+
+        Returns: self
+        '''
+        n_changed = self._load_data()
+        if not len(self.labels):
+            raise ModelException('No decided Q values to train the model on')
+
+        if self.trained and n_changed == 0:
+            return self
+
+        if validate:
+            try:
+                self.test_model()
+            except ValueError as e:
+                # too few states to split off a test set
+                print('Skipping the model assessment: {}'.format(e))
+
+        try:
+            if self.trained and not self.dropped and \
+                    hasattr(self.model, 'partial_fit'):
+                self.model.partial_fit(self.features[self.changed],
+                                       self.labels[self.changed])
+            else:
+                self.model.fit(self.features, self.labels)
+        except ValueError as e:
+            raise ModelException('Cannot train the model on {} states: {}'
+                                 .format(len(self.labels), e)) from e
+
+        self.trained = True
+        self.compile_policy()
         self.save_model()
 
+        return self
+
     def _get_features_from_state(self, state):
         '''
         Transforms a single state instance to the feature set required
@@ -148,42 +344,47 @@ class Model:
 
         Args:
         ----
-        `state`: (tuple): tuple holding player cards and house cards
+        `state`: (int): state key (see `blackjack.state.encode_state`)
 
         Returns:
         -------
-        `pd.DataFrame` with the feature values for the sample.
+        `np.ndarray` with the feature values for the sample (1 row).
         '''
-        player, house = state
-        counters = [Counter(player), Counter(house)]
+        return encode_features([state])
 
-        player = pd.DataFrame.from_dict(counters[:1]).fillna(0)
-        house = pd.DataFrame.from_dict(counters[1:]).fillna(0)
+    def predict_action(self, state):
+        '''
+        Predicts optimal action for the given state. States of the
+        compiled policy table are looked up, the model is only called
+        for states outside of it.
+
+        Args:
+        ----
+        `state`: (int): state key (see `blackjack.state.encode_state`)
 
-        player.columns = [col + '_pl' for col in player]
-        house.columns = [col + '_ho' for col in house]
+        Returns:
+        -------
+        Predicted label (0 - "stand", 1 - "hit")
+        '''
+        if state in self.policy:
+            return self.policy[state]
 
-        sample = pd.concat([player, house], axis=1)
-        empty = pd.DataFrame(columns=COLUMNS)
-        
-        return pd.concat([empty, sample]).fillna(0)
+        return self.predict_actions([state])[0]
 
-    def predict_action(self, state):
+    def predict_actions(self, states):
         '''
-        Predicts optimal action for the given state.
+        Predicts optimal actions for many states with a single call of
+        the model.
 
         Args:
         ----
-        `state`: (tuple): tuple holding player cards and house cards
+        `states`: sequence of state keys
 
         Returns:
         -------
-        Predicted label (0 - "stand", 1 - "hit")
+        (np.ndarray): predicted labels (0 - "stand", 1 - "hit")
         '''
         if not self.trained:
             raise ModelException('Train model before predicting action')
 
-        transformed = self._get_features_from_state(state)
-        predicted = self.model.predict(transformed.values)
-        
-        return predicted[0]
+        return self.model.predict(encode_features(states))
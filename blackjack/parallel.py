@@ -0,0 +1,319 @@
+import math
+from collections import Counter
+from multiprocessing import Pool
+from blackjack.db import DB
+from blackjack.dealer import Dealer
+from blackjack.logger import Logger
+from blackjack.model import ModelException
+from blackjack.qstore import MemoryQStore
+from blackjack.rng import RNG
+
+
+def merge_Q(master, results):
+    '''
+    Merges the Q tables of the workers into the master table. Q values
+    updated by any worker are replaced by the average of the workers'
+    values weighted by their visit counts, while states only seen by the
+    workers are added with their initial values.
+
+    Args:
+    -----
+    `master`: dict(state: dict(action: value)): master Q table, updated
+    inplace
+
+    `results`: list of (Q, visits) tuples of the workers, in the form of
+    `blackjack.qstore.MemoryQStore.Q` and `.visits`
+
+    Returns: the master Q table
+    '''
+    totals = {}
+    for Q, visits in results:
+        for state, values in Q.items():
+            master.setdefault(state, dict(values))
+
+        for (state, action), n_visits in visits.items():
+            total = totals.setdefault((state, action), [0, 0])
+            total[0] += n_visits * Q[state][action]
+            total[1] += n_visits
+
+    for (state, action), (weighted_sum, n_visits) in totals.items():
+        master[state][action] = weighted_sum / n_visits
+
+    return master
+
+
+def _train_worker(task):
+    '''
+    Trains a fresh player of `player_class` for one synchronization
+    period, starting from the master Q table. Runs in the worker
+    processes: the player only uses an in-memory database.
+
+    Returns: (Q, visits, t, training) of the player after the period
+    '''
+    player_class, params, Q, t, rounds, rng, dealer_params = task
+
+    db = DB(path=':memory:')
+    store = MemoryQStore(db)
+    player = player_class(db=db, q_store=store, rng=rng,
+                          logger=Logger(db, level='off'), **params)
+    store.Q = Q
+    player.t = t
+
+    dealer = Dealer(player, **dealer_params)
+    for _ in range(rounds):
+        if not player.training:
+            break
+        dealer.run_game()
+
+    return store.Q, store.visits, player.t, player.training
+
+
+def _evaluate_worker(task):
+    '''
+    Plays one chunk of testing rounds with a frozen copy of the player.
+    Runs in the worker processes: the player only uses an in-memory
+    database and nothing is logged.
+
+    Returns: (Counter): number of rounds by reward
+    '''
+    player_class, Q, model, rounds, rng, dealer_params = task
+
+    db = DB(path=':memory:')
+    store = MemoryQStore(db)
+    player = player_class(training_rounds=0, db=db, q_store=store, rng=rng,
+                          logger=Logger(db, level='off'))
+    store.Q = Q
+    player.model = model
+
+    dealer = Dealer(player, **dealer_params)
+    return Counter(dealer.run_game() for _ in range(rounds))
+
+
+def proportion_interval(successes, n, z=1.96):
+    '''
+    Wilson score interval of a proportion (95% with the default `z`).
+
+    Returns: (rate, lower, upper) tuple
+    '''
+    if n == 0:
+        return (0, 0, 1)
+
+    rate = successes / n
+    center = (rate + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    margin = z * math.sqrt(rate * (1 - rate) / n + z ** 2 / (4 * n ** 2)) / \
+        (1 + z ** 2 / n)
+
+    return (rate, center - margin, center + margin)
+
+
+class ParallelEvaluator:
+    '''
+    Evaluates the frozen policy of a trained player in a process pool.
+    Testing rounds are independent, so they are split into chunks of
+    `chunk_rounds` rounds, each played with its own child stream of the
+    seed (see `blackjack.rng.RNG.spawn`), spawned in the order of the
+    chunks, so the results do not depend on the number of workers.
+    Rewards are only counted in memory.
+
+    The player's fallback model has to be trained beforehand (see
+    `blackjack.Player.train_model`), as it is sent to the workers with
+    the Q values, which are flushed before the rounds are distributed.
+
+    Args:
+    -----
+    `player`: (blackjack.Player): the trained player
+
+    `workers`: (int): number of worker processes (default=2)
+
+    `chunk_rounds`: (int): number of rounds in one task (default=10000)
+
+    `seed`: (int): seed of the evaluation (default=None)
+
+    `n_decks`, `penetration`: the shoe of the games, see
+    `blackjack.dealer.Dealer` (default: a single deck)
+    '''
+
+    def __init__(self, player, workers=2, chunk_rounds=10000, seed=None,
+                 n_decks=None, penetration=0.75):
+        self.player = player
+        self.workers = workers
+        self.chunk_rounds = chunk_rounds
+        self.seed = seed
+        self.dealer_params = {'n_decks': n_decks,
+                              'penetration': penetration}
+
+    def evaluate(self, rounds):
+        '''
+        Plays `rounds` testing rounds.
+
+        Returns: dict with the number of `rounds`, the `mean_reward` and
+        the `win`, `push` and `loss` rates as (rate, lower, upper) tuples
+        with 95% confidence intervals.
+        '''
+        player = self.player
+        if not player.model.trained:
+            raise ModelException(
+                'the model of the player has to be trained for evaluation')
+
+        player.flush()
+
+        Q = MemoryQStore(player.db).load().Q
+        chunks = [min(self.chunk_rounds, rounds - done)
+                  for done in range(0, rounds, self.chunk_rounds)]
+        rngs = RNG(self.seed).spawn(len(chunks))
+        tasks = [(type(player), Q, player.model, n_rounds, rng,
+                  self.dealer_params)
+                 for n_rounds, rng in zip(chunks, rngs)]
+
+        with Pool(self.workers) as pool:
+            counts = sum(pool.map(_evaluate_worker, tasks), Counter())
+
+        total = sum(reward * n for reward, n in counts.items())
+        mean_reward = total / rounds if rounds else 0
+
+        return {'rounds': rounds,
+                'mean_reward': mean_reward,
+                'win': proportion_interval(counts[10], rounds),
+                'push': proportion_interval(counts[0], rounds),
+                'loss': proportion_interval(counts[-10], rounds)}
+
+
+class ParallelTrainer:
+    '''
+    Trains a player in `workers` processes. Every worker runs its own
+    player and dealer with a local in-memory Q table for `sync_rounds`
+    rounds, then the local tables are merged into the master table with
+    visit-weighted averaging (see `merge_Q`), and the next period starts
+    from the merged table. Training ends when every worker's player has
+    finished training.
+
+    Each worker follows the epsilon schedule of the player on its own
+    round counter. With `constant_epsilon` the player's `training_rounds`
+    is split between the workers.
+
+    Training starts from the player's Q values and round counter, which
+    are split evenly between the workers, so a player restored from a
+    checkpoint continues where it was.
+
+    Args:
+    -----
+    `player`: (blackjack.Player): player providing the learning
+    parameters. After every period the merged Q table is written into
+    its database and loaded into its Q store, and its round counter is
+    set to the rounds played so far. At the end the player is switched
+    to testing.
+
+    `workers`: (int): number of worker processes (default=2)
+
+    `sync_rounds`: (int): rounds played by every worker between merges
+    (default=1000)
+
+    `seed`: (int): master seed, every worker gets a child stream of it
+    for every period (see `blackjack.rng.RNG.spawn`), so runs with the
+    same seed give the same Q table (default=None)
+
+    `n_decks`, `penetration`: the shoe of the games, see
+    `blackjack.dealer.Dealer` (default: a single deck)
+
+    `on_merge`: (callable): called without arguments after every period,
+    once the merged table is saved into the player, eg. to write a
+    checkpoint (default=None)
+    '''
+
+    def __init__(self, player, workers=2, sync_rounds=1000, seed=None,
+                 n_decks=None, penetration=0.75, on_merge=None):
+        self.player = player
+        self.workers = workers
+        self.sync_rounds = sync_rounds
+        self.rng = RNG(seed)
+        self.dealer_params = {'n_decks': n_decks,
+                              'penetration': penetration}
+        self.on_merge = on_merge
+        self.Q = {}
+
+    @property
+    def params(self):
+        '''
+        Returns the learning parameters of the player for the workers.
+        '''
+        player = self.player
+        training_rounds = player.training_rounds
+        if player.constant_epsilon:
+            training_rounds = math.ceil(training_rounds / self.workers)
+
+        return {'alpha': player.alpha,
+                'gamma': player.gamma,
+                'epsilon': player._epsilon,
+                'constant_epsilon': player.constant_epsilon,
+                'tolerance': player.tolerance,
+                'training_rounds': training_rounds,
+                'neighbor_depth': player.neighbor_depth}
+
+    def train(self):
+        '''
+        Runs the training and saves the merged Q table in `self.Q`.
+
+        Returns: self
+        '''
+        params = self.params
+        player = self.player
+        player_class = type(player)
+
+        player.flush()
+        self.Q = {}
+        for state, action, value in player.db.load_Q():
+            self.Q.setdefault(state, {})[action] = value
+
+        done, extra = divmod(player.t - 1, self.workers)
+        counters = [done + 1 + (worker < extra)
+                    for worker in range(self.workers)]
+        training = [True] * self.workers
+
+        # skip the streams of the periods played before a checkpoint
+        period = done // self.sync_rounds
+        self.rng.spawn(self.workers * period)
+
+        with Pool(self.workers) as pool:
+            while any(training):
+                rngs = self.rng.spawn(self.workers)
+                tasks = [(player_class, params, self.Q, counters[worker],
+                          self.sync_rounds, rngs[worker], self.dealer_params)
+                         for worker in range(self.workers)
+                         if training[worker]]
+                active = [worker for worker in range(self.workers)
+                          if training[worker]]
+
+                results = pool.map(_train_worker, tasks)
+
+                merge_Q(self.Q, [(Q, visits) for Q, visits, _, _ in results])
+                for worker, (_, _, t, still_training) in zip(active, results):
+                    counters[worker] = t
+                    training[worker] = still_training
+
+                period += 1
+                print(' >> {} training periods done'.format(period),
+                      end="\r", flush=True)
+
+                self.rounds = sum(counters) - self.workers
+                self._save(training=any(training))
+                if self.on_merge is not None:
+                    self.on_merge()
+
+        return self
+
+    def _save(self, training=False):
+        '''
+        Writes the merged Q table into the player's database, loads it
+        into the player's Q store and sets its round counter, switching
+        the player to testing unless `training`.
+        '''
+        player = self.player
+        rows = [(state, action, value)
+                for state, values in self.Q.items()
+                for action, value in values.items()]
+
+        player.db.clear_tables(tables=['Q'])
+        player.db.set_many_Q(rows)
+        player.Q.load()
+        player.t = self.rounds + 1
+        player.training = training
@@ -1,7 +1,9 @@
-from itertools import combinations
-import random
 from blackjack.db import DB
+from blackjack.logger import Logger
 from blackjack.model import Model, ModelException
+from blackjack.qstore import SQLiteQStore
+from blackjack.rng import RNG
+from blackjack.state import neighbor_levels
 
 class Player:
     '''
@@ -43,14 +45,51 @@ class Player:
     the training will end after this number of rounds. If set to 0, the
     agent will immediately proceed to testing without clearing the tables
     (default=1000).
-    
+
+    `q_store`: (blackjack.qstore.QStore): backend holding the Q values.
+    Use `blackjack.qstore.MemoryQStore` to keep lookups and updates in
+    process (default: `blackjack.qstore.SQLiteQStore`, which queries the
+    database on every call).
+
+    `flush_rounds`: (int): the Q store is flushed to the database after
+    every `flush_rounds` training rounds and at the end of training
+    (default=1000).
+
+    `db`: (blackjack.db.DB): database for the Q values and logs, eg.
+    `DB(commit_rounds=100)` to commit once every 100 rounds
+    (default: `DB()`)
+
+    `neighbor_depth`: (int): maximum number of cards removed from the
+    final hand when updating neighbor states (default: no limit)
+
+    `logger`: (blackjack.logger.Logger): buffered logger of the actions
+    and results, eg. `Logger(level='results')` to skip logging actions
+    (default: `Logger` with 'full' level)
+
+    `clear_tables`: (bool): clear the tables of the database at start,
+    set to `False` to continue a previous run (default=True)
+
+    `rng`: (blackjack.rng.RNG): random source of the exploration and the
+    tie breaking, also used by the `blackjack.dealer.Dealer` of the
+    player, eg. `RNG(seed)` for a reproducible run (default: new
+    unseeded `RNG`)
+
+    `replay`: (blackjack.experience.ReplayBuffer): replay buffer over
+    the player's `blackjack.qstore.ArrayQStore`. Every transition of the
+    rounds is stored in it and learned from in vectorized batches,
+    instead of updating only the last decision of a round right away,
+    and the neighbor states of the final hands are updated after their
+    batch (default=None)
+
     Properties
     ----------
     `ACTIONS`: list(str): constant list of possible actions the player
     can take.
 
     `player.t`: (int): round counter (mainly for epsilon decay functions)
-    
+
+    `player.Q`: (blackjack.qstore.QStore): the Q store in use
+
     `self.training`: (bool): flag indicating whether the agent is in
     learning (`True`) or testing phase (`False`)
     '''
@@ -60,7 +99,10 @@ class Player:
     last_transition = None
 
     def __init__(self, alpha=0.5, gamma=0.9, epsilon=0.9, constant_epsilon=False,
-                tolerance=0.01, training_rounds=1000):
+                tolerance=0.01, training_rounds=1000, q_store=None,
+                flush_rounds=1000, db=None, logger=None,
+                neighbor_depth=None, clear_tables=True, rng=None,
+                replay=None):
         self.alpha = alpha
         self.gamma = gamma
         self._epsilon = epsilon
@@ -68,14 +110,26 @@ class Player:
         self.tolerance = tolerance
         self.training_rounds = training_rounds
         self.training = bool(self.training_rounds)
+        self.flush_rounds = flush_rounds
+        self.neighbor_depth = neighbor_depth
+        self.rng = rng or RNG()
 
-        self.db = DB()
-        if self.training:
+        self.db = db or DB()
+        if clear_tables and self.training:
             self.db.clear_tables()
-        else:
+        elif clear_tables:
             self.db.clear_tables(tables=['results', 'actions'])
 
-        self.model = Model()
+        self.logger = logger or Logger(self.db)
+        self.Q = q_store or SQLiteQStore(self.db)
+        self.Q.load()
+
+        assert replay is None or replay.store is self.Q, \
+            'replay has to use the Q store of the player'
+        self.replay = replay
+        self.replay_states = []
+
+        self.model = Model(db=self.db)
 
     def action(self, state, options):
         '''
@@ -102,12 +156,12 @@ class Player:
         if self.training:
             phase = 'Training'
 
-            self.db.init_Q(state, self.ACTIONS)
-            roll = random.random() < self.epsilon
+            self.Q.init_Q(state, self.ACTIONS)
+            roll = self.rng.random() < self.epsilon
             if roll:
                 potential_actions = options
             else:
-                potential_actions = self.db.argmax_Q(state, options)
+                potential_actions = self.Q.argmax_Q(state, options)
  
             if len(potential_actions) > 1:
                 decision = 'Exploring'
@@ -115,10 +169,10 @@ class Player:
                 decision = 'Learned'
         else:
             phase = 'Testing'
-            state_in_Q = self.db.check_stateQ(state)
+            state_in_Q = self.Q.check_stateQ(state)
 
             if state_in_Q:
-                potential_actions = self.db.argmax_Q(state, options)
+                potential_actions = self.Q.argmax_Q(state, options)
                 if len(potential_actions) > 1:
                     decision = 'Exploring'
                 else:
@@ -128,19 +182,26 @@ class Player:
                 potential_actions = [self._get_modelled_action(state)] 
                 decision = 'Modelled'
 
-        action = random.choice(potential_actions)
+        action = self.rng.choice(potential_actions)
         
         if self.training:
+            if self.replay is not None and self.last_transition:
+                # the previous decision of the round led here
+                self.replay.add(*self.last_transition, 0, state)
             self.last_transition = (state, action)
 
-        self.db.log_action(phase, state, action, decision, self.t)
+        self.logger.log_action(phase, state, action, decision, self.t)
 
         return action
 
     def _get_modelled_action(self, state):
         if not self.model.trained:
-            self.model.train()
-        
+            try:
+                self.model.train()
+            except ModelException:
+                # too few learned states to train the model on
+                return self.rng.choice(self.ACTIONS)
+
         pred = self.model.predict_action(state)
 
         if pred == 0:
@@ -167,14 +228,50 @@ class Player:
         if self.training:
             self.learn(reward)
 
-        self.db.log_results(self.training, final_state, reward, self.t)
+        self.logger.log_results(self.training, final_state, reward, self.t)
+        self.db.end_round()
 
         if (not self.constant_epsilon and self.epsilon < self.tolerance) or \
                 (self.constant_epsilon and self.t >= self.training_rounds):
             self.training = False
+            self.flush()
+        elif self.training and self.t % self.flush_rounds == 0:
+            self.flush()
  
         self.t += 1
 
+    def train_model(self, validate=True):
+        '''
+        Trains (or retrains) the fallback model on the current Q values
+        ahead of time, so the first modelled decision does not have to
+        wait for it. Pending Q values are flushed first.
+
+        Args
+        ----
+        `validate`: (bool): assess the model before fitting it
+        (default=True)
+
+        Returns: self
+        '''
+        self.flush()
+        self.model.train(validate=validate)
+        return self
+
+    def flush(self):
+        '''
+        Persists the pending Q values of the Q store and the buffered
+        logs into the database and commits the pending transaction. The
+        waiting transitions of the replay buffer are learned from first.
+
+        Returns: self
+        '''
+        if self.replay is not None and self.replay.pending:
+            self._replay()
+        self.Q.flush()
+        self.logger.flush()
+        self.db.commit()
+        return self
+
     def learn(self, reward):
         '''
         Takes the reward and applies the Q-approximation iteration
@@ -189,11 +286,29 @@ class Player:
         '''
         if self.last_transition:
             state, action = self.last_transition
-            self._update_Q_value(state, action, reward, 0)
-            self._update_neighbor_states(state, 'hit')
+            if self.replay is None:
+                self._update_Q_value(state, action, reward, 0)
+                self._update_neighbor_states(state, 'hit')
+            else:
+                # the neighbors are updated from the replayed values
+                self.replay.add(state, action, reward)
+                self.replay_states.append(state)
+                if self.replay.ready:
+                    self._replay()
         
         self.last_transition = None
 
+    def _replay(self):
+        '''
+        Learns from the waiting transitions of the replay buffer, then
+        updates the neighbor states of the final hands of their rounds.
+        '''
+        self.replay.replay(self.alpha, self.gamma)
+        for state in self.replay_states:
+            self._update_neighbor_states(state, 'hit')
+
+        self.replay_states = []
+
     def _update_Q_value(self, state, action, reward, next_Q):
         '''
         Update Q value of the given action on a given state using the 
@@ -213,24 +328,29 @@ class Player:
         Returns: None
         -------
         '''
-        old_value = self.db.get_Q_value(state, action)
+        old_value = self.Q.get_Q_value(state, action)
         new_value = (1 - self.alpha) * old_value + \
             self.alpha * (reward + self.gamma * next_Q)
         
-        self.db.set_Q(state, action, new_value)
+        self.Q.set_Q(state, action, new_value)
     
     def _update_neighbor_states(self, state, action):
         '''
         Neighbor state is a state from which the player can end up in
         the current state by taking the given action. The method finds
-        these "backwards" and recursively updates Q values for any 
-        possible states that can be a "predecessor" to the current state
-        in a chain of actions.
-
-        This includes finding n-1 length combinations of player cards and
-        combine these hands with the known house card. Update Q values 
-        for all these states, and recursively apply the method to these
-        states too.
+        these "backwards" and updates Q values for any possible states
+        that can be a "predecessor" to the current state in a chain of
+        actions.
+
+        This includes removing one card from the player cards and keeping
+        the known house card, then repeating it on the resulting states
+        down to 2-card hands. Hands holding the same rank more than once
+        give the same neighbors along many paths, so the neighbors are
+        walked level by level in the deduplicated graph of
+        `blackjack.state.neighbor_levels` (cached by state), and each of
+        them is updated exactly once. The next Q value of a neighbor is
+        the average of the max Q values of the states it leads to in the
+        graph, which are already updated at that point.
 
         Example:  
         > Player has (2 3 K A), house holds K, therefore the "direct"
@@ -249,17 +369,18 @@ class Player:
         Returns: None
         ------
         '''
-        player_cards, house_card = state
-        max_Q = self.db.max_Q(state)
+        max_Qs = {state: self.Q.max_Q(state)}
 
-        if len(player_cards) > 2:
-            combos = combinations(player_cards, len(player_cards) - 1)
-            neighbor_states = [((combo, house_card), action) for combo in combos]
-        
-            for neighbor_state, action in neighbor_states:
-                self.db.init_Q(neighbor_state, self.ACTIONS)
-                self._update_Q_value(neighbor_state, action, 0, max_Q)
-                self._update_neighbor_states(neighbor_state, 'hit')
+        for level in neighbor_levels(state, self.neighbor_depth):
+            for neighbor_state, successors in level:
+                next_Q = sum(max_Qs[successor] for successor in successors) / \
+                    len(successors)
+
+                self.Q.init_Q(neighbor_state, self.ACTIONS)
+                self._update_Q_value(neighbor_state, action, 0, next_Q)
+                max_Qs[neighbor_state] = self.Q.max_Q(neighbor_state)
+
+            action = 'hit'
     
     @property
     def epsilon(self):
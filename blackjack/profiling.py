@@ -0,0 +1,232 @@
+import contextlib
+import cProfile
+import functools
+import os
+import time
+from blackjack.db import DB
+from blackjack.qstore import QStore
+
+DB_METHODS = [name for name in dir(DB)
+              if not name.startswith('_') and callable(getattr(DB, name))]
+'''Public methods of `blackjack.db.DB`, all of them are instrumented'''
+
+Q_METHODS = ['init_Q', 'check_stateQ', 'max_Q', 'argmax_Q', 'get_Q_value',
+             'set_Q', 'load', 'flush']
+
+PLAYER_METHODS = ['action', 'learn', '_update_neighbor_states',
+                  'set_reward', 'flush']
+
+UNATTRIBUTED = '(other)'
+'''Component of the SQL statements run outside instrumented methods'''
+
+
+class Profiler:
+    '''
+    Opt-in instrumentation of a simulation. Attaching the profiler
+    replaces the hot methods of the simulator's objects (the dealer, the
+    player, its database, Q store, model and deck) with timed wrappers
+    on the instances themselves, so nothing changes for objects that are
+    not profiled. Every component (`Class.method`) gets a cumulative
+    call count, wall time (including the time of nested components) and
+    the number of SQL statements run while it was the innermost
+    instrumented call (counted with `sqlite3.Connection.set_trace_callback`).
+
+    The counters are collected per phase (see `start_phase` and
+    `end_phase`), and a summary is printed and written at the end of
+    every phase, optionally with a cProfile dump.
+
+    Args:
+    -----
+    `output_dir`: (str): directory of the summaries
+    (`{phase}_profile.txt`) and cProfile dumps (`{phase}.pstats`),
+    nothing is written if None (default=None)
+
+    `cprofile`: (bool): run cProfile during the phases, the stats are
+    dumped into `output_dir` (default=False)
+
+    `verbose`: (bool): print the summary at the end of the phases
+    (default=True)
+
+    Properties
+    ----------
+    `phases`: dict(phase: dict): the `seconds` and the counters of the
+    `components` of the finished phases
+    '''
+
+    def __init__(self, output_dir=None, cprofile=False, verbose=True):
+        self.output_dir = output_dir
+        self.cprofile = cprofile
+        self.verbose = verbose
+        self.phases = {}
+        self.phase = None
+        self.counters = {}
+        self.stack = []
+        self.patched = []
+        self.connections = []
+        self._profile = None
+
+    def wrap(self, obj, name, component=None):
+        '''
+        Replaces the method `name` of `obj` with a timed wrapper.
+        '''
+        func = getattr(obj, name)
+        component = component or '{}.{}'.format(type(obj).__name__, name)
+        profiler = self
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counter = profiler._counter(component)
+            profiler.stack.append(counter)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                counter[1] += clock() - start
+                counter[0] += 1
+                profiler.stack.pop()
+
+        setattr(obj, name, wrapper)
+        self.patched.append((obj, name))
+
+    def _counter(self, component):
+        counter = self.counters.get(component)
+        if counter is None:
+            counter = self.counters[component] = [0, 0.0, 0]
+
+        return counter
+
+    def _trace(self, statement):
+        counter = self.stack[-1] if self.stack else \
+            self._counter(UNATTRIBUTED)
+        counter[2] += 1
+
+    def attach(self, simulator):
+        '''
+        Instruments the dealer and the player of a simulator, and counts
+        the SQL statements of the player's database connection.
+
+        Returns: self
+        '''
+        dealer = simulator.dealer
+        player = simulator.player
+
+        self.wrap(dealer, 'run_game')
+        for name in ['deal', 'reshuffle']:
+            self.wrap(dealer.deck, name)
+        for name in PLAYER_METHODS:
+            self.wrap(player, name)
+        for name in DB_METHODS:
+            self.wrap(player.db, name)
+        if isinstance(player.Q, QStore):
+            for name in Q_METHODS:
+                self.wrap(player.Q, name)
+        for name in ['train', 'predict_action']:
+            self.wrap(player.model, name)
+
+        connection = player.db.connection
+        connection.set_trace_callback(self._trace)
+        self.connections.append(connection)
+
+        return self
+
+    def detach(self):
+        '''
+        Restores the original methods and stops counting SQL statements.
+
+        Returns: self
+        '''
+        for obj, name in reversed(self.patched):
+            delattr(obj, name)
+        for connection in self.connections:
+            connection.set_trace_callback(None)
+
+        self.patched = []
+        self.connections = []
+        return self
+
+    @contextlib.contextmanager
+    def suspended(self):
+        '''
+        Context manager restoring the original methods for the duration
+        of the block, eg. to pickle the profiled objects: the wrappers
+        are closures on the instances, which cannot be pickled.
+        '''
+        wrappers = [(obj, name, vars(obj)[name]) for obj, name in self.patched]
+        for obj, name, _ in reversed(wrappers):
+            delattr(obj, name)
+        try:
+            yield self
+        finally:
+            for obj, name, wrapper in wrappers:
+                setattr(obj, name, wrapper)
+
+    def start_phase(self, phase):
+        '''
+        Resets the counters and starts timing (and profiling) a phase.
+        '''
+        self.phase = phase
+        self.counters = {}
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    def end_phase(self):
+        '''
+        Stops the phase, saves its counters into `phases`, then prints
+        and writes the summary.
+
+        Returns: (dict): the counters of the phase
+        '''
+        seconds = time.perf_counter() - self._start
+        if self._profile:
+            self._profile.disable()
+
+        result = {'seconds': seconds,
+                  'components': {
+                      component: {'calls': calls, 'seconds': elapsed,
+                                  'sql': sql}
+                      for component, (calls, elapsed, sql)
+                      in self.counters.items()}}
+        self.phases[self.phase] = result
+
+        summary = self.summary(self.phase)
+        if self.verbose:
+            print('\n' + summary)
+
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir,
+                                '{}_profile.txt'.format(self.phase))
+            with open(path, 'w') as file:
+                file.write(summary)
+            if self._profile:
+                self._profile.dump_stats(os.path.join(
+                    self.output_dir, '{}.pstats'.format(self.phase)))
+
+        self._profile = None
+        return result
+
+    def summary(self, phase):
+        '''
+        Formats the counters of a finished phase as a table, components
+        in decreasing order of their wall time.
+        '''
+        result = self.phases[phase]
+        components = sorted(result['components'].items(),
+                            key=lambda item: -item[1]['seconds'])
+        total_sql = sum(counter['sql'] for _, counter in components)
+
+        lines = ['{} phase: {:.3f}s, {} SQL statements'.format(
+                     phase.upper(), result['seconds'], total_sql),
+                 '{:<40} {:>10} {:>10} {:>6} {:>10}'.format(
+                     'component', 'calls', 'seconds', '%', 'sql')]
+        for component, counter in components:
+            share = counter['seconds'] / result['seconds'] \
+                if result['seconds'] else 0
+            lines.append('{:<40} {:>10} {:>10.3f} {:>6.1%} {:>10}'.format(
+                component, counter['calls'], counter['seconds'], share,
+                counter['sql']))
+
+        return '\n'.join(lines) + '\n'
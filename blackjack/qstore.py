@@ -0,0 +1,310 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from blackjack.db import DB
+from blackjack.statespace import StateSpace
+
+
+class QStore(ABC):
+    '''
+    Interface for the storage of Q values used by `blackjack.Player`.
+    Method names follow the query methods of `blackjack.db.DB`, so any
+    backend can be plugged into the player through its `q_store`
+    argument.
+
+    Subclasses have to implement the abstract Q accessors (`init_Q`,
+    `check_stateQ`, `max_Q`, `argmax_Q`, `get_Q_value` and `set_Q`),
+    otherwise they cannot be instantiated, while `load` and `flush` are
+    optional hooks for backends that keep the values outside of the `Q`
+    table of the database.
+    '''
+
+    def load(self):
+        '''
+        Loads previously persisted Q values into the store.
+
+        Returns: self
+        '''
+        return self
+
+    def flush(self):
+        '''
+        Persists pending changes into the `Q` table of the database.
+
+        Returns: self
+        '''
+        return self
+
+    @abstractmethod
+    def init_Q(self, state, actions):
+        raise NotImplementedError
+
+    @abstractmethod
+    def check_stateQ(self, state):
+        raise NotImplementedError
+
+    @abstractmethod
+    def max_Q(self, state, keys=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def argmax_Q(self, state, keys=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_Q_value(self, state, action):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_Q(self, state, action, value):
+        raise NotImplementedError
+
+
+class SQLiteQStore(QStore):
+    '''
+    Q store reading and writing the `Q` table directly through a
+    `blackjack.db.DB` instance on every call.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database to use (default: new `DB()`)
+    '''
+
+    def __init__(self, db=None):
+        self.db = db or DB()
+
+    def init_Q(self, state, actions):
+        self.db.init_Q(state, actions)
+
+    def check_stateQ(self, state):
+        return self.db.check_stateQ(state)
+
+    def max_Q(self, state, keys=None):
+        return self.db.max_Q(state, keys)
+
+    def argmax_Q(self, state, keys=None):
+        return self.db.argmax_Q(state, keys)
+
+    def get_Q_value(self, state, action):
+        return self.db.get_Q_value(state, action)
+
+    def set_Q(self, state, action, value):
+        self.db.set_Q(state, action, value)
+
+
+class MemoryQStore(QStore):
+    '''
+    Dict-backed Q store, which keeps every Q value in process and only
+    touches the database when `load` or `flush` is called. Changed
+    states are tracked and written to the `Q` table in one bulk insert
+    on `flush`.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database used for loading and flushing the
+    Q values (default: new `DB()`)
+
+    Properties
+    ----------
+    `Q`: dict(state: dict(action: value)): the Q values in memory
+
+    `dirty`: set(state): states changed since the last flush
+
+    `visits`: dict((state, action): int): number of updates of each Q
+    value since the store was created or `visits` was reset
+    '''
+
+    def __init__(self, db=None):
+        self.db = db or DB()
+        self.Q = {}
+        self.dirty = set()
+        self.visits = {}
+
+    def load(self):
+        '''
+        Replaces the values in memory with the content of the `Q` table.
+
+        Returns: self
+        '''
+        self.Q = {}
+        for state, action, value in self.db.load_Q():
+            self.Q.setdefault(state, {})[action] = value
+
+        self.dirty = set()
+        return self
+
+    def flush(self):
+        '''
+        Writes the states changed since the last flush into the `Q`
+        table with a single bulk insert.
+
+        Returns: self
+        '''
+        if self.dirty:
+            rows = [(state, action, value)
+                    for state in self.dirty
+                    for action, value in self.Q[state].items()]
+            self.db.set_many_Q(rows)
+            self.dirty = set()
+
+        return self
+
+    def init_Q(self, state, actions):
+        if state not in self.Q:
+            self.Q[state] = {action: 0 for action in actions}
+            self.dirty.add(state)
+
+    def check_stateQ(self, state):
+        return state in self.Q
+
+    def _values(self, state, keys):
+        values = self.Q[state]
+        if keys is None:
+            return values
+
+        return {action: value for action, value in values.items()
+                if action in keys}
+
+    def max_Q(self, state, keys=None):
+        return max(self._values(state, keys).values())
+
+    def argmax_Q(self, state, keys=None):
+        values = self._values(state, keys)
+        max_Q = max(values.values())
+
+        return [action for action, value in values.items()
+                if value == max_Q]
+
+    def get_Q_value(self, state, action):
+        return self.Q.get(state, {}).get(action)
+
+    def set_Q(self, state, action, value):
+        if state in self.Q and action in self.Q[state]:
+            self.Q[state][action] = value
+            self.dirty.add(state)
+            key = (state, action)
+            self.visits[key] = self.visits.get(key, 0) + 1
+
+
+class ArrayQStore(QStore):
+    '''
+    Q store keeping the Q values in a preallocated NumPy array of shape
+    (number of states, number of actions) over the dense indices of a
+    `blackjack.statespace.StateSpace`. Every reachable state has its row
+    from the start, so initializing a state only marks it as seen.
+    Changed states are written to the `Q` table on `flush`, like in
+    `MemoryQStore`.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database used for loading and flushing the
+    Q values (default: new `DB()`)
+
+    `space`: (blackjack.statespace.StateSpace): the state space
+    (default: new `StateSpace()`)
+
+    `actions`: list(str): the actions, in the order of the columns
+    (default: ['hit', 'stand'])
+
+    Properties
+    ----------
+    `values`: (np.ndarray): the Q values, one row per state
+
+    `seen`: (np.ndarray): whether each state was initialized
+
+    `dirty`: (np.ndarray): whether each state changed since the last
+    flush
+
+    `visit_counts`: (np.ndarray): number of updates of each Q value
+    '''
+
+    def __init__(self, db=None, space=None, actions=None):
+        self.db = db or DB()
+        self.space = space or StateSpace()
+        self.actions = list(actions or ['hit', 'stand'])
+        self.columns = {action: i for i, action in enumerate(self.actions)}
+
+        shape = (len(self.space), len(self.actions))
+        self.values = np.zeros(shape)
+        self.seen = np.zeros(shape[0], dtype=bool)
+        self.dirty = np.zeros(shape[0], dtype=bool)
+        self.visit_counts = np.zeros(shape, dtype=np.int64)
+
+    def load(self):
+        '''
+        Replaces the values in memory with the content of the `Q` table.
+        Rows of states outside of the state space are ignored.
+
+        Returns: self
+        '''
+        self.values[:] = 0
+        self.seen[:] = False
+        for state, action, value in self.db.load_Q():
+            i = self.space.index.get(state)
+            if i is not None and action in self.columns:
+                self.values[i, self.columns[action]] = value
+                self.seen[i] = True
+
+        self.dirty[:] = False
+        return self
+
+    def flush(self):
+        '''
+        Writes the states changed since the last flush into the `Q`
+        table with a single bulk insert.
+
+        Returns: self
+        '''
+        changed = np.flatnonzero(self.dirty)
+        if len(changed):
+            states = self.space.keys[changed].tolist()
+            rows = [(state, action, value)
+                    for state, values in zip(states,
+                                             self.values[changed].tolist())
+                    for action, value in zip(self.actions, values)]
+            self.db.set_many_Q(rows)
+            self.dirty[:] = False
+
+        return self
+
+    def init_Q(self, state, actions):
+        i = self.space.index[state]
+        if not self.seen[i]:
+            self.seen[i] = True
+            self.dirty[i] = True
+
+    def check_stateQ(self, state):
+        i = self.space.index.get(state)
+        return i is not None and bool(self.seen[i])
+
+    def _row(self, state, keys):
+        row = self.values[self.space.index[state]]
+        if keys is None:
+            return self.actions, row.tolist()
+
+        keys = [action for action in self.actions if action in keys]
+        return keys, [row[self.columns[action]] for action in keys]
+
+    def max_Q(self, state, keys=None):
+        return max(self._row(state, keys)[1])
+
+    def argmax_Q(self, state, keys=None):
+        actions, values = self._row(state, keys)
+        max_Q = max(values)
+
+        return [action for action, value in zip(actions, values)
+                if value == max_Q]
+
+    def get_Q_value(self, state, action):
+        i = self.space.index.get(state)
+        if i is None or not self.seen[i] or action not in self.columns:
+            return None
+
+        return float(self.values[i, self.columns[action]])
+
+    def set_Q(self, state, action, value):
+        i = self.space.index.get(state)
+        if i is not None and self.seen[i] and action in self.columns:
+            j = self.columns[action]
+            self.values[i, j] = value
+            self.dirty[i] = True
+            self.visit_counts[i, j] += 1
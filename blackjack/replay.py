@@ -0,0 +1,210 @@
+import os
+import numpy as np
+
+PHASES = ['Training', 'Testing']
+ACTIONS = ['stand', 'hit']
+DECISIONS = ['Learned', 'Exploring', 'Modelled']
+'''Values of the enum coded fields, the code is the index in the list'''
+
+PHASE_CODES = {phase: code for code, phase in enumerate(PHASES)}
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+DECISION_CODES = {decision: code for code, decision in enumerate(DECISIONS)}
+
+ACTION_DTYPE = np.dtype([('round_no', '<i8'), ('state', '<i8'),
+                         ('phase', 'u1'), ('action', 'u1'),
+                         ('decision', 'u1')])
+'''Record of the actions log (19 bytes)'''
+
+RESULT_DTYPE = np.dtype([('round_no', '<i8'), ('state', '<i8'),
+                         ('phase', 'u1'), ('result', '<i2')])
+'''Record of the results log (19 bytes)'''
+
+MAGIC = b'BJREPLAY'
+
+LOGS = {'actions': ACTION_DTYPE, 'results': RESULT_DTYPE}
+'''Record types of the logs by name, the file of a log is `{name}.bin`'''
+
+HEADER_SIZE = 16
+'''Size of the file header: `MAGIC` and the name of the log'''
+
+
+class ReplayException(Exception):
+    pass
+
+
+def _header(name):
+    return MAGIC + name.encode().ljust(HEADER_SIZE - len(MAGIC), b'\0')
+
+
+def _check_header(path, name):
+    with open(path, 'rb') as file:
+        if file.read(HEADER_SIZE) != _header(name):
+            raise ReplayException('{} is not a {} log'.format(path, name))
+
+
+class ReplayWriter:
+    '''
+    Append-only binary log of the actions and results of the rounds, a
+    compact alternative of the `actions` and `results` tables. Every
+    row is a fixed-width record of `ACTION_DTYPE` or `RESULT_DTYPE` with
+    the phase, action and decision coded as small integers and the state
+    as its integer key, so writing a batch of rows is a single buffered
+    `write`.
+
+    It has the row writing methods of `blackjack.db.DB`, so it can be
+    passed to `blackjack.logger.Logger` as its `sink`.
+
+    Args:
+    -----
+    `directory`: (str): directory of the log files, created if needed
+    (default='logs/replay')
+
+    `append`: (bool): keep the records of existing logs, otherwise they
+    are truncated (default=False)
+    '''
+
+    def __init__(self, directory='logs/replay', append=False):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.files = {}
+        for name in LOGS:
+            path = os.path.join(directory, '{}.bin'.format(name))
+            if append and os.path.exists(path):
+                _check_header(path, name)
+                self.files[name] = open(path, 'ab')
+            else:
+                self.files[name] = open(path, 'wb')
+                self.files[name].write(_header(name))
+
+    def log_action_rows(self, rows):
+        '''
+        Appends (phase, state, action, decision, round_no) rows to the
+        actions log.
+        '''
+        records = np.array([(round_no, state, PHASE_CODES[phase],
+                             ACTION_CODES[action], DECISION_CODES[decision])
+                            for phase, state, action, decision, round_no
+                            in rows], dtype=ACTION_DTYPE)
+        self.files['actions'].write(records.tobytes())
+
+    def log_result_rows(self, rows):
+        '''
+        Appends (phase, state, result, round_no) rows to the results log.
+        '''
+        records = np.array([(round_no, state, PHASE_CODES[phase], result)
+                            for phase, state, result, round_no in rows],
+                           dtype=RESULT_DTYPE)
+        self.files['results'].write(records.tobytes())
+
+    def flush(self):
+        '''
+        Writes the buffered records into the files.
+
+        Returns: self
+        '''
+        for file in self.files.values():
+            file.flush()
+
+        return self
+
+    def clear(self):
+        '''
+        Drops every record of the logs.
+
+        Returns: self
+        '''
+        for file in self.files.values():
+            file.flush()
+            file.truncate(HEADER_SIZE)
+            file.seek(HEADER_SIZE)
+
+        return self
+
+    def delete_rounds(self, first_round):
+        '''
+        Drops the records of the rounds from `first_round` on, eg. the
+        rounds played after a checkpoint. Records are appended in the
+        order of the rounds, so the logs are truncated at the first
+        record of `first_round` or later.
+
+        Returns: self
+        '''
+        for name, file in self.files.items():
+            file.flush()
+            records = read_log(file.name, name)
+            later = np.flatnonzero(records['round_no'] >= first_round)
+            if len(later):
+                file.truncate(HEADER_SIZE +
+                              int(later[0]) * records.dtype.itemsize)
+                file.seek(0, os.SEEK_END)
+            del records
+
+        return self
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+def read_log(path, name):
+    '''
+    Maps a log file into memory without reading it.
+
+    Args:
+    -----
+    `path`: (str): path of the file
+
+    `name`: (str): 'actions' or 'results'
+
+    Returns: (np.ndarray): read-only structured array of the records
+    (a trailing partial record is ignored)
+    '''
+    _check_header(path, name)
+    dtype = LOGS[name]
+    n_records = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if n_records == 0:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE,
+                     shape=(n_records,))
+
+
+class ReplayReader:
+    '''
+    Reader of the logs written by `ReplayWriter`. The files are memory
+    mapped, so a full scan does not copy the records.
+
+    Args:
+    -----
+    `directory`: (str): directory of the log files
+    (default='logs/replay')
+    '''
+
+    def __init__(self, directory='logs/replay'):
+        self.directory = directory
+
+    def read(self, name):
+        '''
+        Returns the records of the 'actions' or 'results' log as a
+        structured array (see `read_log`).
+        '''
+        return read_log(os.path.join(self.directory,
+                                     '{}.bin'.format(name)), name)
+
+    @property
+    def actions(self):
+        return self.read('actions')
+
+    @property
+    def results(self):
+        return self.read('results')
+
+    def chunks(self, name, chunk_size=1000000):
+        '''
+        Yields the records of a log in views of at most `chunk_size`
+        records.
+        '''
+        records = self.read(name)
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
@@ -0,0 +1,119 @@
+import copy
+from array import array
+import numpy as np
+
+
+class RNG:
+    '''
+    Seedable random source of the simulation, backed by a NumPy
+    `Generator`. Numbers are drawn from the generator in blocks: uniform
+    floats `block_size` at a time, and permutations of a given length in
+    blocks of about `block_size` numbers, so a single draw in the game
+    loop is a list lookup instead of a call into the generator.
+
+    Independent streams for parallel workers are derived with `spawn`,
+    and the full state (the generator and the unused part of the blocks)
+    can be saved and restored with `getstate` and `setstate`, or by
+    pickling the object.
+
+    Args:
+    -----
+    `seed`: (int, list(int) or np.random.SeedSequence): seed of the
+    stream, fresh entropy from the OS if None (default=None)
+
+    `block_size`: (int): number of values generated at once
+    (default=4096)
+    '''
+
+    def __init__(self, seed=None, block_size=4096):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+
+        self.block_size = block_size
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self._uniforms = []
+        self._position = 0
+        self._permutations = {}
+
+    def random(self):
+        '''
+        Returns a uniform float in [0, 1).
+        '''
+        try:
+            value = self._uniforms[self._position]
+        except IndexError:
+            self._uniforms = self.generator.random(self.block_size).tolist()
+            self._position = 0
+            value = self._uniforms[0]
+
+        self._position += 1
+        return value
+
+    def choice(self, seq):
+        '''
+        Returns a random element of a non-empty sequence.
+        '''
+        if len(seq) == 1:
+            return seq[0]
+
+        return seq[int(self.random() * len(seq))]
+
+    def permutation(self, n):
+        '''
+        Returns a random permutation of range(`n`) as a list.
+        '''
+        block, position = self._permutations.get(n, (None, 0))
+        if block is None or position >= len(block):
+            rows = max(1, self.block_size // max(n, 1))
+            block = self.generator.permuted(
+                np.tile(np.arange(n), (rows, 1)), axis=1)
+            position = 0
+
+        self._permutations[n] = (block, position + 1)
+        return block[position].tolist()
+
+    def shuffle(self, seq):
+        '''
+        Shuffles a list or an `array.array` inplace.
+        '''
+        order = self.permutation(len(seq))
+        if isinstance(seq, array):
+            values = np.frombuffer(seq, dtype=seq.typecode)[order]
+            seq[:] = array(seq.typecode, values.tobytes())
+        else:
+            seq[:] = [seq[i] for i in order]
+
+    def spawn(self, n):
+        '''
+        Derives `n` independent child streams. Children are numbered in
+        the order of spawning, so the same seed spawns the same children.
+
+        Returns: list(RNG)
+        '''
+        return [RNG(child, block_size=self.block_size)
+                for child in self.seed_sequence.spawn(n)]
+
+    def getstate(self):
+        '''
+        Returns the state of the stream, see `setstate`.
+        '''
+        return copy.deepcopy({'seed_sequence': self.seed_sequence,
+                              'bit_generator': self.generator.bit_generator
+                              .state,
+                              'uniforms': self._uniforms,
+                              'position': self._position,
+                              'permutations': self._permutations})
+
+    def setstate(self, state):
+        '''
+        Restores a state returned by `getstate`, the stream continues
+        with the same numbers.
+        '''
+        state = copy.deepcopy(state)
+        self.seed_sequence = state['seed_sequence']
+        self.generator.bit_generator.state = state['bit_generator']
+        self._uniforms = state['uniforms']
+        self._position = state['position']
+        self._permutations = state['permutations']
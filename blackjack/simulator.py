@@ -1,6 +1,12 @@
+import time
 from blackjack.dealer import Dealer
 from blackjack.player import Player
+from blackjack.model import ModelException
 from blackjack.db import DB
+from blackjack.logger import Logger
+from blackjack.parallel import ParallelEvaluator, ParallelTrainer
+from blackjack.checkpoint import atomic_dump, load_checkpoint, snapshot
+from blackjack.replay import ReplayWriter
 
 class Simulator:
     '''
@@ -12,37 +18,235 @@ class Simulator:
     `player`: configured blackjack.Player instance which is added to the
     underlying blackjack.Dealer object.  
     `test_games`: number of rounds for testing the learning after 
-    training phase is finished
+    training phase is finished  
+    `workers`: number of processes for training, with more than one
+    worker the training phase is run by `blackjack.parallel.ParallelTrainer`,
+    which does not support players with a replay buffer (default=1)  
+    `sync_rounds`: rounds per worker between merging the Q tables in
+    parallel training (default=1000)  
+    `seed`: master seed of parallel training (default=None)  
+    `checkpoint_path`: file of the checkpoints of the training phase,
+    see `checkpoint` and `resume` (default=None: no checkpoints)  
+    `checkpoint_rounds`: write a checkpoint after every
+    `checkpoint_rounds` training rounds, in parallel training at the end
+    of the first merge period after them (default=None)  
+    `checkpoint_seconds`: write a checkpoint when `checkpoint_seconds`
+    passed since the last one (default=None)  
+    `profiler`: `blackjack.profiling.Profiler` attached to the dealer
+    and the player, which reports timings and SQL statement counts of
+    the training and testing phases (default=None: no instrumentation)  
+    `n_decks`: number of decks in the shoe of the games, in serial and
+    parallel training and evaluation alike (default=None: a single deck
+    reshuffled before every round)  
+    `penetration`: share of the shoe dealt before reshuffling
+    (default=0.75)
     '''
-    def __init__(self, player, test_games=100):
+    def __init__(self, player, test_games=100, workers=1, sync_rounds=1000,
+                 seed=None, checkpoint_path=None, checkpoint_rounds=None,
+                 checkpoint_seconds=None, profiler=None, n_decks=None,
+                 penetration=0.75):
+        assert workers <= 1 or player.replay is None, \
+            'replay buffers are not supported with parallel training'
+
         self.player = player
         self.test_games = test_games
-        self.dealer = Dealer(self.player)
-        self.db = DB()
+        self.workers = workers
+        self.sync_rounds = sync_rounds
+        self.seed = seed
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_rounds = checkpoint_rounds
+        self.checkpoint_seconds = checkpoint_seconds
+        self.last_checkpoint = time.monotonic()
+        self.checkpoint_round = player.t - 1
+        self.n_decks = n_decks
+        self.penetration = penetration
+        self.dealer = Dealer(self.player, n_decks=n_decks,
+                             penetration=penetration)
+        self.db = player.db
+        self.profiler = profiler
+        if profiler:
+            profiler.attach(self)
+
+    def checkpoint(self, path=None):
+        '''
+        Atomically writes the full state of the learner (see
+        `blackjack.checkpoint.snapshot`) into `path`. Pending Q values
+        and logs are flushed into the database first.
+
+        Args:  
+        `path`: file of the checkpoint (default: `checkpoint_path`)
+
+        Returns: (str): the path of the checkpoint
+        '''
+        path = path or self.checkpoint_path
+        atomic_dump(snapshot(self), path)
+        self.last_checkpoint = time.monotonic()
+        self.checkpoint_round = self.player.t - 1
+
+        return path
+
+    def _checkpoint_due(self):
+        if not self.checkpoint_path:
+            return False
+
+        # parallel training advances by whole periods
+        rounds = self.player.t - 1 - self.checkpoint_round
+        if self.checkpoint_rounds and rounds >= self.checkpoint_rounds:
+            return True
+
+        return bool(self.checkpoint_seconds) and \
+            time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds
+
+    def _periodic_checkpoint(self):
+        if self.player.training and self._checkpoint_due():
+            self.checkpoint()
+
+    @classmethod
+    def resume(cls, path, **kwargs):
+        '''
+        Recreates a simulation from a checkpoint written by `checkpoint`.
+        The player is rebuilt on its database without clearing it: the Q
+        table is restored from the checkpoint and the actions and results
+        logged after the checkpoint are deleted, from the log files too if
+        the logger wrote into a `blackjack.replay.ReplayWriter`. The round
+        counter, the random stream, the replay buffer and the deck
+        continue where they were, so `run` carries on with the training
+        (or testing) phase.
+
+        Args:  
+        `path`: file of the checkpoint  
+        Other keyword arguments override the saved settings of the
+        simulator, eg. `test_games`.
+
+        Returns: (Simulator)
+        '''
+        state = load_checkpoint(path)
+        rng_state = state['rng'].getstate()
+
+        db = DB(**state['db'])
+        db.clear_tables(tables=['Q'])
+        db.set_many_Q(state['Q'])
+        db.delete_rounds(state['t'])
+        db.commit()
+
+        q_store = state['q_store_class'](db)
+        replay = state['replay']
+        if replay is not None:
+            replay.store = q_store
+
+        sink = None
+        if state.get('sink_directory'):
+            sink = ReplayWriter(state['sink_directory'], append=True)
+            sink.delete_rounds(state['t'])
+
+        player = state['player_class'](
+            db=db, q_store=q_store,
+            logger=Logger(db, sink=sink, **state['logger']),
+            clear_tables=False, rng=state['rng'], replay=replay,
+            **state['params'])
+        player.t = state['t']
+        player.training = state['training']
+
+        settings = dict(state['simulator'], **kwargs)
+        simulator = cls(player, **settings)
+        simulator.dealer.deck = state['deck']
+        # the new dealer shuffled a deck of its own on the way
+        player.rng.setstate(rng_state)
+
+        return simulator
         
     def run(self):
         '''
         Runs the simulation in two phases: 
-        1) training until the `player.training` flag is set to `True`   
-        2) testing after training flag is set to `False`.
+        1) training until the `player.training` flag is set to `True`
+        (in parallel if `workers` is more than one), with checkpoints if
+        `checkpoint_path` is set, the last one at the end of training  
+        2) testing after training flag is set to `False`, with the
+        player's fallback model trained before the first testing round.
+
+        The pending Q values and logs are flushed at the end of both
+        phases, which also waits for the background writer of the
+        database if it writes asynchronously.
 
         Returns: self
         '''
+        if self.profiler:
+            self.profiler.start_phase('training')
+
+        if self.workers > 1 and self.player.training:
+            ParallelTrainer(self.player, workers=self.workers,
+                            sync_rounds=self.sync_rounds, seed=self.seed,
+                            n_decks=self.n_decks,
+                            penetration=self.penetration,
+                            on_merge=self._periodic_checkpoint).train()
+
         rounds = 1
         while self.player.training:
             self.dealer.run_game()
             print(' >> {} training round done'.format(
                 rounds), end="\r", flush=True)
             rounds += 1
+            self._periodic_checkpoint()
+
+        if self.checkpoint_path:
+            self.checkpoint()
+        else:
+            self.player.flush()
 
         print()
 
+        if self.profiler:
+            self.profiler.end_phase()
+            self.profiler.start_phase('testing')
+
+        if self.test_games:
+            try:
+                self.player.train_model()
+            except ModelException:
+                # nothing to learn from yet, the model stays untrained
+                pass
+
         for test in range(1, self.test_games + 1):
             self.dealer.run_game()
             print(' >> {} testing round done'.format(
                 test), end="\r", flush=True)
         
+        self.player.flush()
+        if self.profiler:
+            self.profiler.end_phase()
+
         self.db.export_test_results()
         print()
 
         return self
+
+    def evaluate(self, rounds=None, workers=None, seed=None):
+        '''
+        Evaluates the trained player in parallel instead of the serial
+        testing phase of `run` (see `blackjack.parallel.ParallelEvaluator`).
+        Nothing is logged into the database. The player's fallback model
+        is trained first if it is not yet, which raises `ModelException`
+        when there are too few learned states to train it on.
+
+        Args:  
+        `rounds`: number of testing rounds (default: `test_games`)  
+        `workers`: number of processes (default: `workers`)  
+        `seed`: seed of the evaluation (default: `seed`)
+
+        Returns: (dict): win, push and loss rates with 95% confidence
+        intervals
+        '''
+        if not self.player.model.trained:
+            self.player.train_model()
+
+        evaluator = ParallelEvaluator(
+            self.player, workers=workers or self.workers,
+            seed=self.seed if seed is None else seed,
+            n_decks=self.n_decks, penetration=self.penetration)
+
+        if self.profiler:
+            # the player's model is pickled for the workers
+            with self.profiler.suspended():
+                return evaluator.evaluate(rounds or self.test_games)
+
+        return evaluator.evaluate(rounds or self.test_games)
@@ -0,0 +1,310 @@
+import numpy as np
+from blackjack.deck import CARD_RANKS, CARD_VALUES, SUITS
+from blackjack.state import HOUSE_BITS, RANK_MASKS, RANK_SHIFTS, RANK_UNITS
+from blackjack.statespace import StateSpace
+
+RANK_VALUES = np.array([CARD_VALUES[rank] for rank in CARD_RANKS])
+'''Value of each rank in `CARD_RANKS` order (aces counted as 1)'''
+
+N_VALUES = 10
+'''Number of card values (1-10), the house only depends on these'''
+
+HOUSE_OUTCOMES = [17, 18, 19, 20, 21, 'bust']
+'''Final values of the house hand, in the column order of the outcomes'''
+
+
+class Solver:
+    '''
+    Exact solver of the game played by `blackjack.dealer.Dealer`: the
+    player gets two cards and the house one, the player can hit while the
+    value of the hand is below 21, then the house draws to 17 (standing
+    on soft 17) and the winner gets 10, a push gives 0.
+
+    Expected values are computed by dynamic programming over the states
+    of a `blackjack.statespace.StateSpace`. The final hand of the house
+    is solved for every player hand at once: the draws of the house are
+    memoized by the multiset of card values it holds. With a finite shoe
+    every card dealt (the player's cards, the upcard and the cards of the
+    house) is taken into account; with an infinite deck every rank has
+    the same probability in every draw.
+
+    Args:
+    -----
+    `n_decks`: (int): number of decks in the shoe, reshuffled before
+    every round (eg. 1 for `Dealer` with the default `Deck`), None for an
+    infinite deck (default=None)
+
+    Properties (after `solve`)
+    ----------
+    `stand_ev`, `hit_ev`: (np.ndarray): expected reward of standing and
+    of hitting (then playing optimally) in each state of `space`, the
+    hit values of states of 21 are NaN
+
+    `ev`: (np.ndarray): expected reward of optimal play in each state
+
+    `policy`: dict(int: str): optimal action of each state in which the
+    player has to decide
+    '''
+
+    def __init__(self, n_decks=None):
+        self.n_decks = n_decks
+        max_per_rank = None if n_decks is None else len(SUITS) * n_decks
+        self.space = StateSpace(max_per_rank=max_per_rank)
+
+        counts = np.stack([(self.space.keys >> RANK_SHIFTS[rank]) &
+                           RANK_MASKS[rank] for rank in CARD_RANKS], axis=1)
+        self.counts = counts.astype(float)
+        self.houses = self.space.keys & ((1 << HOUSE_BITS) - 1)
+
+    def _probabilities(self, removed):
+        '''
+        Probabilities of the next card by rank (columns in `CARD_RANKS`
+        order) after the `removed` cards (counts in the same order, one
+        row per case) were dealt.
+        '''
+        if self.n_decks is None:
+            return np.full(removed.shape, 1 / len(CARD_RANKS))
+
+        remaining = len(SUITS) * self.n_decks - removed
+        return remaining / remaining.sum(axis=1, keepdims=True)
+
+    def _house_outcomes(self, house, removed):
+        '''
+        Distribution of the final value of the house hand started from
+        the upcard of rank index `house`, after the `removed` cards (rank
+        counts, one row per case, the upcard included) were dealt.
+
+        Returns: (np.ndarray): probabilities of shape (len(removed), 6),
+        columns in `HOUSE_OUTCOMES` order
+        '''
+        # the house only depends on card values, so the ten-valued
+        # ranks are merged (rows: values 1-10)
+        by_value = np.zeros((len(CARD_RANKS), N_VALUES))
+        by_value[np.arange(len(CARD_RANKS)), RANK_VALUES - 1] = 1
+        removed = removed @ by_value
+        in_shoe = np.bincount(RANK_VALUES - 1) * \
+            len(SUITS) * (self.n_decks or 1)
+
+        outcomes = np.zeros((len(removed), len(HOUSE_OUTCOMES)))
+        level = {(): np.ones(len(removed))}
+        upcard = RANK_VALUES[house]
+        while level:
+            drawn_next = {}
+            for drawn, probability in level.items():
+                hard = upcard + sum(drawn)
+                soft = (upcard == 1 or 1 in drawn) and hard <= 11
+                value = hard + 10 * soft
+                if value > 21:
+                    outcomes[:, -1] += probability
+                    continue
+                elif value >= 17:
+                    outcomes[:, value - 17] += probability
+                    continue
+
+                remaining = in_shoe - removed
+                if self.n_decks is not None:
+                    remaining = remaining - np.bincount(
+                        np.array(drawn, dtype=int) - 1, minlength=N_VALUES)
+                probabilities = remaining / remaining.sum(axis=1,
+                                                          keepdims=True)
+
+                for card in range(1, N_VALUES + 1):
+                    key = tuple(sorted(drawn + (card,)))
+                    p = probability * probabilities[:, card - 1]
+                    if key in drawn_next:
+                        drawn_next[key] = drawn_next[key] + p
+                    else:
+                        drawn_next[key] = p
+
+            level = drawn_next
+
+        return outcomes
+
+    def _stand_ev(self):
+        '''
+        Expected reward of standing in every state of the space.
+        '''
+        stand_ev = np.empty(len(self.space))
+        values = self.space.values
+        for house in range(len(CARD_RANKS)):
+            rows = np.flatnonzero(self.houses == house)
+            if self.n_decks is None:
+                outcomes = np.repeat(self._house_outcomes(
+                    house, np.zeros((1, len(CARD_RANKS)))), len(rows), axis=0)
+            else:
+                removed = self.counts[rows].copy()
+                removed[:, house] += 1
+                outcomes = self._house_outcomes(house, removed)
+
+            # P(house < player) + P(house bust) - P(house > player)
+            final = np.array(HOUSE_OUTCOMES[:-1])
+            lower = (final < values[rows, None]) * outcomes[:, :-1]
+            higher = (final > values[rows, None]) * outcomes[:, :-1]
+            stand_ev[rows] = 10 * (lower.sum(axis=1) + outcomes[:, -1] -
+                                   higher.sum(axis=1))
+
+        return stand_ev
+
+    def _hit_probabilities(self):
+        '''
+        Probabilities of the next card of the player by rank in every
+        state.
+        '''
+        removed = self.counts.copy()
+        removed[np.arange(len(removed)), self.houses] += 1
+
+        return self._probabilities(removed)
+
+    def _successors(self):
+        '''
+        Indices of the states after one more card of each rank (columns
+        in `CARD_RANKS` order), -1 where the player busts.
+        '''
+        return np.stack([self.space.index_of(self.space.keys +
+                                             RANK_UNITS[rank])
+                         for rank in CARD_RANKS], axis=1)
+
+    def _backward(self, choose):
+        '''
+        Computes the expected reward of every state from the hands with
+        the most cards towards the 2-card hands. `choose(i, hit_ev)`
+        gives the expected reward of the states `i` (in which the player
+        has to decide) from their hit values.
+
+        Returns: (hit_ev, ev) arrays over the states
+        '''
+        probabilities = self._hit_probabilities()
+        successors = self._successors()
+        hit_ev = np.full(len(self.space), np.nan)
+        ev = self.stand_ev.copy()
+        deciding = self.space.values < 21
+
+        for n_cards in range(self.space.n_cards.max(), 1, -1):
+            rows = np.flatnonzero((self.space.n_cards == n_cards) & deciding)
+            if not len(rows):
+                continue
+
+            next_rows = successors[rows]
+            next_ev = np.where(next_rows >= 0, ev[next_rows], -10)
+            hit_ev[rows] = (probabilities[rows] * next_ev).sum(axis=1)
+            ev[rows] = choose(rows, hit_ev[rows])
+
+        return hit_ev, ev
+
+    def solve(self):
+        '''
+        Computes the expected rewards and the optimal policy.
+
+        Returns: self
+        '''
+        self.stand_ev = self._stand_ev()
+        self.hit_ev, self.ev = self._backward(
+            lambda rows, hit_ev: np.maximum(hit_ev, self.stand_ev[rows]))
+
+        deciding = np.flatnonzero(self.space.values < 21)
+        hits = self.hit_ev[deciding] > self.stand_ev[deciding]
+        self.policy = dict(zip(self.space.keys[deciding].tolist(),
+                               np.where(hits, 'hit', 'stand').tolist()))
+
+        return self
+
+    def evaluate(self, policy, default_action='stand'):
+        '''
+        Computes the expected reward of every state when playing the
+        given policy.
+
+        Args:
+        -----
+        `policy`: dict(int: str): action ('hit' or 'stand') for state keys
+
+        `default_action`: (str): action for states missing from the
+        policy (default='stand')
+
+        Returns: (np.ndarray): expected rewards over the states
+        '''
+        if not hasattr(self, 'stand_ev'):
+            self.solve()
+
+        hits = np.array([policy.get(key, default_action) == 'hit'
+                         for key in self.space.keys.tolist()])
+
+        return self._backward(
+            lambda rows, hit_ev: np.where(hits[rows], hit_ev,
+                                          self.stand_ev[rows]))[1]
+
+    def starting_probabilities(self):
+        '''
+        Probabilities of the starting states (two player cards, then the
+        upcard of the house).
+
+        Returns: (np.ndarray): probabilities over the states (zero for
+        states of more than two cards)
+        '''
+        n_ranks = len(CARD_RANKS)
+        probabilities = np.zeros(len(self.space))
+        removed = np.zeros((1, n_ranks))
+        first = self._probabilities(removed)[0]
+        for a in range(n_ranks):
+            removed[0, a] += 1
+            second = self._probabilities(removed)[0]
+            for b in range(n_ranks):
+                removed[0, b] += 1
+                house = self._probabilities(removed)[0]
+                key = RANK_UNITS[CARD_RANKS[a]] + RANK_UNITS[CARD_RANKS[b]]
+                rows = self.space.index_of(key + np.arange(n_ranks))
+                probabilities[rows] += first[a] * second[b] * house
+                removed[0, b] -= 1
+            removed[0, a] -= 1
+
+        return probabilities
+
+    def game_value(self, ev=None):
+        '''
+        Expected reward of a round.
+
+        Args:
+        -----
+        `ev`: (np.ndarray): expected rewards over the states (default:
+        optimal play)
+
+        Returns: (float)
+        '''
+        if ev is None:
+            if not hasattr(self, 'ev'):
+                self.solve()
+            ev = self.ev
+
+        return float(self.starting_probabilities() @ ev)
+
+    def regret(self, policy, default_action='stand'):
+        '''
+        Measures a policy against the optimal one.
+
+        Args:
+        -----
+        `policy`: dict(int: str): action ('hit' or 'stand') for state keys
+
+        `default_action`: (str): action for states missing from the
+        policy (default='stand')
+
+        Returns: dict with the expected reward of a round with `optimal`
+        play and with the `policy`, their difference (`regret`) and the
+        number of decision states where the policy is not optimal
+        (`mistakes`)
+        '''
+        if not hasattr(self, 'policy'):
+            self.solve()
+
+        optimal = self.game_value()
+        value = self.game_value(self.evaluate(policy, default_action))
+        mistakes = 0
+        for state, action in self.policy.items():
+            chosen = policy.get(state, default_action)
+            i = self.space.index[state]
+            if chosen != action and self.hit_ev[i] != self.stand_ev[i]:
+                mistakes += 1
+
+        return {'optimal': optimal,
+                'policy': value,
+                'regret': optimal - value,
+                'mistakes': mistakes}
@@ -0,0 +1,167 @@
+from functools import lru_cache
+from itertools import accumulate
+from blackjack.deck import CARD_RANKS, CARD_VALUES
+
+HOUSE_BITS = 4
+'''Number of low bits holding the index of the house upcard rank'''
+
+RANK_BITS = [4] * 12 + [5]
+'''
+Number of bits holding the count of each rank (in `CARD_RANKS` order)
+in the player's hand. A hand of value <= 21 holds at most 10 deuces and
+21 aces, so 4 bits are enough for the non-ace ranks, while aces need 5
+(the bust card of a final state included).
+'''
+
+RANK_SHIFTS = dict(zip(CARD_RANKS, accumulate([HOUSE_BITS] + RANK_BITS[:-1])))
+'''Bit offset of the count of each rank in the state key'''
+
+RANK_UNITS = {rank: 1 << shift for rank, shift in RANK_SHIFTS.items()}
+'''Amount to add to a state key for one more card of the given rank'''
+
+RANK_MASKS = {rank: (1 << bits) - 1 for rank, bits in zip(CARD_RANKS, RANK_BITS)}
+
+HOUSE_INDEX = {rank: i for i, rank in enumerate(CARD_RANKS)}
+
+
+def encode_state(player_cards, house_card):
+    '''
+    Encodes a game state as a single integer key: the low `HOUSE_BITS`
+    bits hold the index of the house upcard's rank, followed by the
+    count of each rank in the player's hand. Equal multisets of player
+    ranks give the same key regardless of the order and suits of the
+    cards.
+
+    Args:
+    -----
+    `player_cards`: list(str): player cards (first character has to be
+    the rank, eg. 'As', '4c', but 'A', '4' works too)
+
+    `house_card`: (str): the open card of the house
+
+    Returns: (int): the state key
+    '''
+    key = HOUSE_INDEX[house_card[0]]
+    for card in player_cards:
+        key += RANK_UNITS[card[0]]
+
+    return key
+
+
+def rank_counts(key):
+    '''
+    Returns the count of each rank (in `CARD_RANKS` order) in the
+    player's hand of the state key.
+    '''
+    return [(key >> RANK_SHIFTS[rank]) & RANK_MASKS[rank]
+            for rank in CARD_RANKS]
+
+
+def house_rank(key):
+    '''
+    Returns the rank of the house upcard of the state key.
+    '''
+    return CARD_RANKS[key & ((1 << HOUSE_BITS) - 1)]
+
+
+def n_cards(key):
+    '''
+    Returns the number of player cards in the state key.
+    '''
+    return sum(rank_counts(key))
+
+
+def decode_state(key):
+    '''
+    Decodes a state key into the ((P1, P2, ...), H) tuple form, where
+    P1, P2, ... are the sorted player ranks and H is the rank of the
+    house upcard, eg. (('A', '4'), 'K'). Used for reporting.
+    '''
+    player = []
+    for rank, count in zip(CARD_RANKS, rank_counts(key)):
+        player.extend([rank] * count)
+
+    return (tuple(sorted(player)), house_rank(key))
+
+
+@lru_cache(maxsize=None)
+def unique_predecessors(key):
+    '''
+    Returns the distinct states with one less player card (one state per
+    rank held), as a tuple.
+    '''
+    return tuple(key - RANK_UNITS[rank]
+                 for rank, count in zip(CARD_RANKS, rank_counts(key))
+                 if count)
+
+
+@lru_cache(maxsize=None)
+def neighbor_levels(key, max_depth=None):
+    '''
+    Builds the deduplicated graph of the predecessor states of a state
+    down to 2-card hands: level `i` holds the distinct states with `i + 1`
+    less cards than `key`, each with its successors in the previous level
+    (the states of the graph it can lead to with one more card).
+
+    Args:
+    -----
+    `key`: (int): state key
+
+    `max_depth`: (int): maximum number of levels (default: no limit)
+
+    Returns: tuple of levels, each a tuple of (state, successors) pairs
+    '''
+    levels = []
+    current = [key]
+    while n_cards(current[0]) > 2 and \
+            (max_depth is None or len(levels) < max_depth):
+        successors = {}
+        for state in current:
+            for predecessor in unique_predecessors(state):
+                successors.setdefault(predecessor, []).append(state)
+
+        levels.append(tuple((state, tuple(states))
+                            for state, states in successors.items()))
+        current = list(successors)
+
+    return tuple(levels)
+
+
+def reachable_states(max_per_rank=None, max_value=20):
+    '''
+    Enumerates the states in which the player has to decide: hands of at
+    least two cards with a value below 21 (an ace counted as 11 where it
+    does not bust the hand), combined with every house upcard.
+
+    Args:
+    -----
+    `max_per_rank`: (int): maximum number of cards of the same rank in a
+    hand, eg. 4 for a single deck (default: no limit)
+
+    `max_value`: (int): highest hand value to include, 21 adds the
+    states the player can not act in any more (default=20)
+
+    Returns: list(int): sorted state keys
+    '''
+    hands = []
+
+    def extend(rank_index, key, total, cards, has_ace):
+        if rank_index == len(CARD_RANKS):
+            value = total + 10 if has_ace and total <= 11 else total
+            if cards >= 2 and value <= max_value:
+                hands.append(key)
+            return
+
+        rank = CARD_RANKS[rank_index]
+        count = 0
+        while total + count * CARD_VALUES[rank] <= max_value and \
+                (max_per_rank is None or count <= max_per_rank):
+            extend(rank_index + 1, key + count * RANK_UNITS[rank],
+                   total + count * CARD_VALUES[rank], cards + count,
+                   has_ace or (rank == 'A' and count > 0))
+            count += 1
+
+    extend(0, 0, 0, 0, False)
+
+    return sorted(hand + house for hand in hands
+                  for house in range(len(CARD_RANKS)))
@@ -0,0 +1,93 @@
+import numpy as np
+from blackjack.deck import CARD_RANKS, CARD_VALUES
+from blackjack.state import (RANK_MASKS, RANK_SHIFTS, RANK_UNITS,
+                             reachable_states)
+
+
+class StateSpace:
+    '''
+    Enumeration of every reachable state (player hands of at least two
+    cards with a value of at most 21, combined with every house upcard)
+    with a dense integer index in the order of the state keys, so tables
+    over the states can be preallocated NumPy arrays.
+
+    Args:
+    -----
+    `max_per_rank`: (int): maximum number of cards of the same rank in a
+    hand, eg. 4 for a single deck (default: no limit)
+
+    Properties
+    ----------
+    `keys`: (np.ndarray): sorted state keys, the index of a state is its
+    position
+
+    `index`: dict(int: int): index of each state key
+
+    `values`: (np.ndarray): value of the player's hand in each state
+
+    `soft`: (np.ndarray): whether an ace is counted as 11 in the hand
+
+    `n_cards`: (np.ndarray): number of player cards in each state
+
+    `pred_indptr`, `pred_indices`: predecessors of the states in CSR
+    form: the indices of the states the player could have hit from to
+    reach state `i` are `pred_indices[pred_indptr[i]:pred_indptr[i + 1]]`
+    '''
+
+    def __init__(self, max_per_rank=None):
+        self.keys = np.array(reachable_states(max_per_rank, max_value=21),
+                             dtype=np.int64)
+        self.index = {key: i for i, key in enumerate(self.keys.tolist())}
+
+        counts = np.stack([(self.keys >> RANK_SHIFTS[rank]) & RANK_MASKS[rank]
+                           for rank in CARD_RANKS], axis=1)
+        hard = counts @ np.array([CARD_VALUES[rank] for rank in CARD_RANKS])
+        aces = counts[:, CARD_RANKS.index('A')]
+        self.soft = (aces > 0) & (hard <= 11)
+        self.values = hard + 10 * self.soft
+        self.n_cards = counts.sum(axis=1)
+
+        # one predecessor per rank held, for hands of more than 2 cards
+        states, predecessors = [], []
+        for r, rank in enumerate(CARD_RANKS):
+            held = np.flatnonzero((counts[:, r] > 0) & (self.n_cards > 2))
+            states.append(held)
+            predecessors.append(self.index_of(self.keys[held] -
+                                              RANK_UNITS[rank]))
+
+        states = np.concatenate(states)
+        predecessors = np.concatenate(predecessors)
+        valid = self.values[predecessors] < 21
+        states, predecessors = states[valid], predecessors[valid]
+
+        order = np.argsort(states, kind='stable')
+        self.pred_indices = predecessors[order]
+        self.pred_indptr = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(states, minlength=len(self.keys)),
+                  out=self.pred_indptr[1:])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def index_of(self, keys):
+        '''
+        Vectorized lookup of the indices of state keys.
+
+        Returns: (np.ndarray): indices of the states, -1 for keys outside
+        of the state space
+        '''
+        keys = np.asarray(keys, dtype=np.int64)
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+
+        return np.where(self.keys[pos] == keys, pos, -1)
+
+    def predecessors(self, i):
+        '''
+        Returns the indices of the states the player could have hit from
+        to reach the state of index `i`.
+        '''
+        return self.pred_indices[self.pred_indptr[i]:self.pred_indptr[i + 1]]
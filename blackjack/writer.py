@@ -0,0 +1,123 @@
+import atexit
+import os
+import queue
+import threading
+
+_STOP = object()
+
+
+class WriterException(Exception):
+    pass
+
+
+class AsyncWriter:
+    '''
+    Background writer of a database. Batches of rows are put on a
+    bounded queue as (statement, rows) pairs, and a dedicated thread
+    drains the queue and runs them with `executemany` on its own pooled
+    connection (see `blackjack.db.DB.connection`), grouping everything
+    queued at that point into one transaction. When the queue is full,
+    `put` blocks until the thread catches up, so a slow disk slows the
+    simulation down instead of growing the memory use.
+
+    An error of the thread is raised as `WriterException` by the next
+    `put`, `flush` or `close`.
+
+    Args:
+    -----
+    `db`: (blackjack.db.DB): database to write into, it has to be a
+    file, as an in-memory database is not shared between connections
+
+    `queue_size`: (int): maximum number of queued batches
+    (default=1000)
+
+    `batch_size`: (int): maximum number of batches per transaction
+    (default=100)
+
+    The thread is stopped by `close`, or at exit after writing the
+    queued rows.
+    '''
+
+    def __init__(self, db, queue_size=1000, batch_size=100):
+        if db.path == ':memory:':
+            raise WriterException(
+                'in-memory databases cannot be written asynchronously')
+
+        self.db = db
+        self.pid = os.getpid()
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name='AsyncWriter({})'.format(db.path))
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise WriterException('writing into {} failed'.format(
+                self.db.path)) from error
+
+    def put(self, statement, rows):
+        '''
+        Queues rows to be written with `statement`, blocking while the
+        queue is full.
+        '''
+        self._check()
+        self.queue.put((statement, rows))
+
+    def _next_batches(self):
+        batches = [self.queue.get()]
+        while len(batches) < self.batch_size and batches[-1] is not _STOP:
+            try:
+                batches.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batches
+
+    def _run(self):
+        con = self.db.connection
+        stop = False
+        while not stop:
+            batches = self._next_batches()
+            stop = batches[-1] is _STOP
+            try:
+                with con:
+                    for batch in batches:
+                        if batch is not _STOP:
+                            con.executemany(*batch)
+            except Exception as e:
+                self.error = e
+            finally:
+                for _ in batches:
+                    self.queue.task_done()
+
+        con.close()
+
+    @property
+    def alive(self):
+        return self.thread.is_alive()
+
+    def flush(self):
+        '''
+        Waits until every queued row is written and committed.
+
+        Returns: self
+        '''
+        self.queue.join()
+        self._check()
+        return self
+
+    def close(self):
+        '''
+        Writes the queued rows and stops the thread, and drops the exit
+        handler, which would keep the writer and its database alive.
+        '''
+        if self.alive:
+            self.queue.put(_STOP)
+            self.thread.join()
+        atexit.unregister(self.close)
+
+        self._check()
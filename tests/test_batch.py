@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from blackjack.batch import BatchDealer, hand_values
+from blackjack.dealer import Dealer
+from blackjack.state import encode_state
+
+
+class TestBatchDealer(unittest.TestCase):
+
+    def test_hand_values(self):
+        hands = [
+            ['3d', 'Tc'],
+            ['Ad', 'Tc'],
+            ['Ad', '2c'],
+            ['Ad', 'Ac'],
+            ['Ks', 'Qs', 'Ad']
+        ]
+
+        for hand in hands:
+            with self.subTest(hand=hand):
+                hard = sum([1 if card[0] == 'A' else
+                            Dealer.evaluate_cards([card]) for card in hand])
+                aces = len([card for card in hand if card[0] == 'A'])
+                self.assertEqual(hand_values(np.array([hard]),
+                                             np.array([aces]))[0],
+                                 Dealer.evaluate_cards(hand))
+
+    def test_play(self):
+        rewards = BatchDealer({}, seed=0, batch_size=300).play(1000)
+
+        self.assertEqual(len(rewards), 1000)
+        self.assertTrue(set(np.unique(rewards)) <= {-10, 0, 10})
+        np.testing.assert_array_equal(
+            rewards, BatchDealer({}, seed=0, batch_size=300).play(1000))
+
+    def test_policy_lookup(self):
+        state = encode_state(['2', '3'], 'T')
+        dealer = BatchDealer({state: 'hit'}, default_action='stand')
+
+        actions = dealer._lookup(np.array([state, state + 1]))
+        np.testing.assert_array_equal(actions, [1, 0])
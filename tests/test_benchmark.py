@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from blackjack.benchmark import (Benchmark, _player, compare, load_results,
+                                 save_results, time_calls)
+from blackjack.rng import RNG
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_time_calls(self):
+        calls = []
+        result = time_calls(calls.append, 50)
+
+        self.assertListEqual(calls, list(range(50)))
+        self.assertEqual(result['calls'], 50)
+        self.assertGreater(result['per_sec'], 0)
+        self.assertLessEqual(result['p50'], result['p99'])
+
+    def test_run_and_save(self):
+        results = Benchmark(calls=20).run(['evaluate_cards', 'run_game_memory',
+                                           'neighbors_4_cards'])
+        self.assertEqual(results['run_game_memory']['calls'], 20)
+        self.assertEqual(results['neighbors_4_cards']['calls'], 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'benchmark.json')
+            save_results(results, path)
+            self.assertDictEqual(load_results(path), results)
+
+    def test_sqlite_player_on_a_file(self):
+        with _player('sqlite') as player:
+            path = player.db.path
+            self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(path))
+
+        with _player('memory') as player:
+            self.assertEqual(player.db.path, ':memory:')
+
+        results = Benchmark(calls=100).run(['run_game_sqlite'])
+        self.assertEqual(results['run_game_sqlite']['calls'], 10)
+
+    def test_game_cases_are_seeded(self):
+        with patch('blackjack.benchmark.RNG', wraps=RNG) as rng:
+            Benchmark(calls=10, seed=7).run(['deck_deal', 'shoe_deal',
+                                             'run_game_memory'])
+
+        self.assertEqual(rng.call_count, 3)
+        for call in rng.call_args_list:
+            self.assertEqual(call.args, (7,))
+
+    def test_compare(self):
+        baseline = {'a': {'per_sec': 100}, 'b': {'per_sec': 100}}
+        results = {'a': {'per_sec': 90}, 'b': {'per_sec': 50},
+                   'c': {'per_sec': 1}}
+
+        self.assertDictEqual(compare(results, baseline, tolerance=0.2),
+                             {'b': (100, 50, 0.5)})
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from blackjack.checkpoint import (CheckpointException, atomic_dump,
+                                  load_checkpoint, snapshot)
+from blackjack.db import DB
+from blackjack.deck import Shoe
+from blackjack.experience import ReplayBuffer
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.qstore import ArrayQStore, MemoryQStore
+from blackjack.replay import ReplayReader, ReplayWriter
+from blackjack.rng import RNG
+from blackjack.simulator import Simulator
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.path = os.path.join(self.tmp.name, 'checkpoint.pkl')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def make_simulator(self, seed=None):
+        db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=300, db=db, q_store=MemoryQStore(db),
+                        logger=Logger(db, level='results'), rng=RNG(seed))
+
+        return Simulator(player, test_games=0, checkpoint_path=self.path)
+
+    def play(self, simulator, rounds):
+        for _ in range(rounds):
+            simulator.dealer.run_game()
+
+    def test_atomic_dump(self):
+        atomic_dump({'version': 0}, self.path)
+        self.assertListEqual(os.listdir(self.tmp.name), ['checkpoint.pkl'])
+
+        with self.assertRaises(CheckpointException):
+            load_checkpoint(self.path)
+
+    def test_resume_continues_the_run(self):
+        simulator = self.make_simulator(seed=1)
+        self.play(simulator, 100)
+        simulator.checkpoint()
+        self.play(simulator, 50)
+        simulator.player.flush()
+        expected_Q = simulator.player.Q.Q
+
+        resumed = Simulator.resume(self.path)
+        player = resumed.player
+        self.assertEqual(player.t, 101)
+        self.assertTrue(player.training)
+        self.assertIsInstance(player.Q, MemoryQStore)
+        self.assertEqual(player.db.connection.execute(
+            'SELECT MAX(round_no) FROM results').fetchone()[0], 100)
+
+        self.play(resumed, 50)
+        self.assertDictEqual(player.Q.Q, expected_Q)
+
+    def test_resume_with_replay(self):
+        db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        store = ArrayQStore(db)
+        replay = ReplayBuffer(store, capacity=500, batch_size=64,
+                              rng=RNG(2))
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=300, db=db, q_store=store,
+                        logger=Logger(db, level='results'), rng=RNG(1),
+                        replay=replay)
+        simulator = Simulator(player, test_games=0, checkpoint_path=self.path)
+        self.play(simulator, 100)
+        simulator.checkpoint()
+        saved = len(replay)
+        self.play(simulator, 50)
+        player.flush()
+        expected = store.values.copy()
+
+        resumed = Simulator.resume(self.path)
+        self.assertIs(resumed.player.replay.store, resumed.player.Q)
+        self.assertEqual(len(resumed.player.replay), saved)
+        self.play(resumed, 50)
+        resumed.player.flush()
+        self.assertTrue((resumed.player.Q.values == expected).all())
+
+        with self.assertRaises(AssertionError):
+            Simulator(player, workers=2)
+
+    def test_resume_keeps_the_shoe(self):
+        db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=300, db=db, q_store=MemoryQStore(db),
+                        logger=Logger(db, level='results'), rng=RNG(1))
+        simulator = Simulator(player, test_games=0, checkpoint_path=self.path,
+                              n_decks=6, penetration=0.5)
+        self.assertIsInstance(simulator.dealer.deck, Shoe)
+        self.play(simulator, 20)
+        simulator.checkpoint()
+
+        resumed = Simulator.resume(self.path)
+        self.assertEqual((resumed.n_decks, resumed.penetration), (6, 0.5))
+        self.assertIsInstance(resumed.dealer.deck, Shoe)
+        self.assertEqual(resumed.dealer.deck.position,
+                         simulator.dealer.deck.position)
+
+    def make_parallel_simulator(self, path):
+        db = DB(path=path)
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=400, db=db, q_store=MemoryQStore(db),
+                        logger=Logger(db, level='results'))
+
+        return Simulator(player, test_games=0, workers=2, sync_rounds=50,
+                         seed=3, checkpoint_path=self.path,
+                         checkpoint_rounds=150)
+
+    def test_resume_parallel_training(self):
+        simulator = self.make_parallel_simulator('full.db')
+        simulator.run()
+        expected = sorted(simulator.db.load_Q())
+
+        class Preempted(Exception):
+            pass
+
+        simulator = self.make_parallel_simulator('preempted.db')
+        checkpoint = simulator.checkpoint
+
+        def checkpoint_and_stop(path=None):
+            checkpoint(path)
+            raise Preempted
+
+        simulator.checkpoint = checkpoint_and_stop
+        with self.assertRaises(Preempted):
+            simulator.run()
+
+        state = load_checkpoint(self.path)
+        self.assertTrue(state['training'])
+        self.assertEqual(state['t'], 201)
+
+        resumed = Simulator.resume(self.path).run()
+        self.assertEqual(resumed.player.t, 401)
+        self.assertListEqual(sorted(resumed.db.load_Q()), expected)
+
+    def test_resume_with_a_replay_log(self):
+        simulator = self.make_simulator(seed=1)
+        player = simulator.player
+        player.logger = Logger(sink=ReplayWriter('replay'), buffer_size=10)
+        self.play(simulator, 100)
+        simulator.checkpoint()
+        self.play(simulator, 50)
+        player.flush()
+
+        resumed = Simulator.resume(self.path)
+        sink = resumed.player.logger.sink
+        self.assertIsInstance(sink, ReplayWriter)
+        results = ReplayReader('replay').results
+        self.assertEqual(results['round_no'].max(), 100)
+
+        self.play(resumed, 50)
+        resumed.player.flush()
+        results = ReplayReader('replay').results
+        self.assertListEqual(results['round_no'].tolist(),
+                             list(range(1, 151)))
+        sink.close()
+
+        player.logger = Logger(sink=MagicMock())
+        with self.assertRaises(CheckpointException):
+            snapshot(simulator)
+
+    def test_run_writes_checkpoints(self):
+        simulator = self.make_simulator()
+        simulator.checkpoint_rounds = 100
+        simulator.run()
+        self.assertIs(simulator.db, simulator.player.db)
+
+        state = load_checkpoint(self.path)
+        self.assertFalse(state['training'])
+        self.assertEqual(state['t'], 301)
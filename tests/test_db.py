@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from blackjack.db import DB
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.qstore import SQLiteQStore
+from blackjack.state import encode_state
+
+
+class TestDB(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'blackjack.db')
+        self.db = DB(path=self.path, commit_rounds=3)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def count_results(self):
+        with sqlite3.connect(self.path) as con:
+            return con.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def test_connection_is_pooled(self):
+        self.assertIs(self.db.connection, self.db.connection)
+        self.assertIs(self.db.connection, DB(path=self.path).connection)
+
+        mode = self.db.connection.execute('PRAGMA journal_mode').fetchone()
+        self.assertEqual(mode[0], 'wal')
+
+    def test_commit_rounds(self):
+        for round_no in range(1, 3):
+            self.db.log_results(True, 1, 10, round_no)
+            self.db.end_round()
+            self.assertEqual(self.count_results(), 0)
+
+        self.db.log_results(True, 1, 10, 3)
+        self.db.end_round()
+        self.assertEqual(self.count_results(), 3)
+
+    def count_statements(self, func, *args):
+        statements = []
+        self.db.connection.set_trace_callback(statements.append)
+        try:
+            result = func(*args)
+        finally:
+            self.db.connection.set_trace_callback(None)
+
+        # transactions are opened and committed by the sqlite3 module
+        return result, len([statement for statement in statements
+                            if statement not in ['BEGIN ', 'COMMIT']])
+
+    def test_init_Q_is_one_statement(self):
+        _, n = self.count_statements(self.db.init_Q, 1, ['hit', 'stand'])
+        self.assertEqual(n, 1)
+
+        self.db.set_Q(1, 'hit', 5)
+        self.db.init_Q(1, ['hit', 'stand'])
+        self.assertEqual(self.db.get_Q_value(1, 'hit'), 5)
+        self.assertEqual(self.db.get_Q_value(1, 'stand'), 0)
+
+    def test_argmax_Q_is_one_statement(self):
+        self.db.init_Q(1, ['hit', 'stand', 'double'])
+        self.db.set_Q(1, 'hit', 2)
+        self.db.set_Q(1, 'double', 3)
+
+        actions, n = self.count_statements(self.db.argmax_Q, 1)
+        self.assertEqual((actions, n), (['double'], 1))
+        actions, n = self.count_statements(self.db.argmax_Q, 1,
+                                           ['hit', 'stand'])
+        self.assertEqual((actions, n), (['hit'], 1))
+
+        self.db.set_Q(1, 'stand', 2)
+        self.assertEqual(self.db.argmax_Q(1, ['hit', 'stand']),
+                         ['hit', 'stand'])
+        self.assertEqual(self.db.max_Q(1, ['hit', 'stand']), 2)
+        self.assertEqual(self.db.argmax_Q(2), [])
+        self.assertIsNone(self.db.max_Q(2))
+
+    def test_training_decision_statements(self):
+        player = Player(db=self.db, q_store=SQLiteQStore(self.db),
+                        epsilon=0, constant_epsilon=True,
+                        logger=Logger(self.db, level='off'))
+        state = encode_state(['2', '3'], 'T')
+
+        # initializing the state and picking the best action
+        _, n = self.count_statements(player.action, state, ['hit', 'stand'])
+        self.assertEqual(n, 2)
+        _, n = self.count_statements(player.action, state, ['hit', 'stand'])
+        self.assertEqual(n, 2)
+
+    def test_set_many_Q_upserts(self):
+        self.db.init_Q(1, ['hit', 'stand'])
+        self.db.set_many_Q([(1, 'hit', 4), (2, 'stand', 1)])
+
+        self.assertEqual(sorted(self.db.load_Q()),
+                         [(1, 'hit', 4), (1, 'stand', 0), (2, 'stand', 1)])
+
+    def test_log_tables_are_indexed(self):
+        plan = self.db.connection.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM results WHERE phase = ? '
+            'ORDER BY round_no', ('Testing',)).fetchall()
+        self.assertIn('results_phase', str(plan))
+
+        plan = self.db.connection.execute(
+            'EXPLAIN QUERY PLAN DELETE FROM actions WHERE round_no >= ?',
+            (1,)).fetchall()
+        self.assertIn('actions_round', str(plan))
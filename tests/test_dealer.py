@@ -1,6 +1,7 @@
 import unittest
 from blackjack.dealer import Dealer
 from blackjack.player import Player
+from blackjack.rng import RNG
 from unittest.mock import Mock, MagicMock
 
 class TestDealer(unittest.TestCase):
@@ -44,6 +45,7 @@ class TestDealer(unittest.TestCase):
         dealer.player_value = 7
         dealer.house_cards = ['Ad']
         dealer.house_value = 11
+        dealer.totals = {'player': (7, False), 'house': (1, True)}
 
         dealer.run_game()
 
@@ -51,8 +53,20 @@ class TestDealer(unittest.TestCase):
 
         self.assertEqual(len(dealer.player_cards), 3)
         self.assertEqual(dealer.player.action.call_count, 2)
+        self.assertEqual(dealer.player_value, 18)
+        self.assertEqual(dealer.house_value, 17)
 
-        dealer.player.reward.assert_called_once()
+        dealer.player.set_reward.assert_called_once_with(10, dealer.game_state)
+
+    def test_full_penetration(self):
+        # a player hitting to the end uses as many cards as possible
+        player = MagicMock(rng=RNG(0))
+        player.action.return_value = 'hit'
+        for n_decks in [1, 6]:
+            with self.subTest(n_decks=n_decks):
+                dealer = Dealer(player, n_decks=n_decks, penetration=1)
+                for _ in range(5000):
+                    dealer.run_game()
 
     def test_evaluate_game(self):
         cases = [
@@ -1,5 +1,6 @@
 import unittest
-from blackjack.deck import Deck, DeckException
+from collections import Counter
+from blackjack.deck import Deck, DeckException, Shoe
 
 
 class DeckTest(unittest.TestCase):
@@ -47,5 +48,32 @@ class DeckTest(unittest.TestCase):
                     self.assertNotIn(dealt[0], self.deck.cards)
 
 
+class ShoeTest(unittest.TestCase):
+    def setUp(self):
+        self.shoe = Shoe(n_decks=2, penetration=0.5)
+
+    def test_composition(self):
+        dealt = self.shoe.deal(n_cards=104)
+        counts = Counter(dealt)
+
+        self.assertEqual(len(counts), 52)
+        self.assertEqual(set(counts.values()), {2})
+
+    def test_cut_card(self):
+        self.shoe.deal(n_cards=51)
+        self.assertFalse(self.shoe.needs_shuffle)
+
+        self.shoe.deal()
+        self.assertTrue(self.shoe.needs_shuffle)
+
+        self.shoe.reshuffle()
+        self.assertEqual(self.shoe.position, 0)
+
+    def test_deal_beyond_end(self):
+        self.shoe.deal(n_cards=100)
+        with self.assertRaises(DeckException):
+            self.shoe.deal(n_cards=5)
+
+
 if __name__ == '__main__':
     unittest.main()
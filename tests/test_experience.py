@@ -0,0 +1,124 @@
+import unittest
+from blackjack.db import DB
+from blackjack.experience import ReplayBuffer
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.qstore import ArrayQStore
+from blackjack.rng import RNG
+from blackjack.state import encode_state
+from blackjack.statespace import StateSpace
+
+
+class TestReplayBuffer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.space = StateSpace()
+
+    def setUp(self):
+        self.db = DB(path=':memory:')
+        self.store = ArrayQStore(self.db, space=self.space)
+        self.buffer = ReplayBuffer(self.store, capacity=4, batch_size=2,
+                                   replay_batches=0, rng=RNG(0))
+        self.first = encode_state(['2', '3'], 'T')
+        self.second = encode_state(['2', '3', '5'], 'T')
+        for state in [self.first, self.second]:
+            self.store.init_Q(state, ['hit', 'stand'])
+
+    def test_batch_update(self):
+        self.store.set_Q(self.second, 'stand', 4)
+        self.buffer.add(self.first, 'hit', 0, self.second)
+        self.buffer.add(self.second, 'stand', 10)
+        self.assertTrue(self.buffer.ready)
+
+        self.assertEqual(self.buffer.replay(alpha=0.5, gamma=0.9), 2)
+        # targets are computed from the values before the batch
+        self.assertAlmostEqual(self.store.get_Q_value(self.first, 'hit'),
+                               0.5 * 0.9 * 4)
+        self.assertAlmostEqual(self.store.get_Q_value(self.second, 'stand'),
+                               0.5 * 4 + 0.5 * 10)
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(len(self.buffer), 2)
+
+    def test_duplicates_are_collapsed(self):
+        self.buffer.add(self.first, 'stand', 10)
+        self.buffer.add(self.first, 'stand', 10)
+        self.buffer.replay(alpha=0.5, gamma=0.9)
+
+        # same as two sequential updates: 5, then 7.5
+        self.assertAlmostEqual(self.store.get_Q_value(self.first, 'stand'),
+                               7.5)
+        i = self.space.index[self.first]
+        self.assertEqual(self.store.visit_counts[i, 1], 2)
+        self.assertTrue(self.store.dirty[i])
+
+    def test_ring(self):
+        for reward in range(6):
+            self.buffer.add(self.first, 'stand', reward)
+        self.buffer.replay(alpha=0.5, gamma=0.9)
+
+        self.assertEqual(len(self.buffer), 4)
+        self.assertListEqual(sorted(self.buffer.rewards), [2, 3, 4, 5])
+
+        with self.assertRaises(KeyError):
+            self.buffer.add(encode_state(['T', 'J', 'Q'], 'T'), 'stand', 0)
+            self.buffer.replay(alpha=0.5, gamma=0.9)
+        # the transitions are kept
+        self.assertEqual(self.buffer.pending, 1)
+
+    def test_player_stores_every_transition(self):
+        buffer = ReplayBuffer(self.store, batch_size=1000, replay_batches=0,
+                              rng=RNG(0))
+        player = Player(epsilon=0, constant_epsilon=True, db=self.db,
+                        q_store=self.store, replay=buffer, rng=RNG(0),
+                        logger=Logger(self.db, level='off'))
+        for state in [self.first, self.second]:
+            self.store.init_Q(state, player.ACTIONS)
+            self.store.set_Q(state, 'hit', 1)
+
+        player.action(self.first, ['stand', 'hit'])
+        player.action(self.second, ['stand', 'hit'])
+        player.set_reward(-10, self.second)
+        self.assertEqual(buffer.pending, 2)
+
+        player.flush()
+        self.assertEqual(buffer.pending, 0)
+        self.assertEqual(len(buffer), 2)
+        self.assertAlmostEqual(self.store.get_Q_value(self.second, 'hit'),
+                               0.5 * 1 - 0.5 * 10)
+
+        with self.assertRaises(AssertionError):
+            Player(db=self.db, replay=buffer,
+                   logger=Logger(self.db, level='off'))
+
+    def play_round(self, replay=None):
+        store = ArrayQStore(self.db, space=self.space)
+        if replay:
+            replay = ReplayBuffer(store, batch_size=1000, replay_batches=0,
+                                  rng=RNG(0))
+        player = Player(epsilon=0, constant_epsilon=True, db=self.db,
+                        q_store=store, replay=replay, rng=RNG(0),
+                        logger=Logger(self.db, level='off'))
+        for state in [self.first, self.second]:
+            store.init_Q(state, player.ACTIONS)
+        store.set_Q(self.second, 'hit', 1)
+        store.set_Q(self.second, 'stand', -20)
+
+        player.action(self.second, ['stand', 'hit'])
+        player.set_reward(-10, self.second)
+        player.flush()
+
+        return store
+
+    def test_neighbors_are_updated_after_replay(self):
+        neighbors = [encode_state(cards, 'T') for cards in [['2', '5'],
+                                                             ['3', '5']]]
+        expected = self.play_round()
+        store = self.play_round(replay=True)
+
+        self.assertAlmostEqual(store.get_Q_value(self.second, 'hit'), -4.5)
+        for state in neighbors:
+            # propagated from the updated value of the final hand
+            self.assertAlmostEqual(store.get_Q_value(state, 'hit'),
+                                   expected.get_Q_value(state, 'hit'))
+            self.assertLess(store.get_Q_value(state, 'hit'), 0)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from blackjack import export
+from blackjack.db import DB
+from blackjack.export import ExportException, ResultExporter
+from blackjack.state import encode_state
+
+
+class TestResultExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        self.state = encode_state(['T', '9'], 'A')
+        self.db.log_result_rows(
+            [('Training' if round_no <= 5 else 'Testing', self.state,
+              10 if round_no % 2 else -10, round_no)
+             for round_no in range(1, 21)])
+        self.exporter = ResultExporter(self.db, chunk_size=3)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_chunks_and_filters(self):
+        chunks = list(self.exporter.chunks(phase='Testing', rounds=(8, 14)))
+        self.assertListEqual([len(rows) for rows in chunks], [3, 3, 1])
+        self.assertEqual(chunks[0][0], ('Testing', self.state, -10, 8))
+        self.assertEqual(self.exporter.count(phase='Training'), 5)
+
+    def test_csv(self):
+        path, n_rows = self.exporter.export(self.path('results.csv'),
+                                            phase='Testing')
+        self.assertEqual(n_rows, 15)
+
+        with open(path) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines[0], 'phase;state;result;round_no')
+        self.assertEqual(lines[1], "Testing;(('9', 'T'), 'A');-10;6")
+        self.assertEqual(len(lines), 16)
+
+    def test_npy_fallback(self):
+        with patch.object(export, '_import_pyarrow', return_value=None):
+            path, n_rows = self.exporter.export(self.path('results.parquet'))
+
+        self.assertTrue(path.endswith('.npy'))
+        records = np.load(path)
+        self.assertEqual(n_rows, 20)
+        np.testing.assert_array_equal(records['round_no'], np.arange(1, 21))
+        self.assertEqual(records['phase'][0], 'Training')
+        self.assertEqual(records['state'][0], self.state)
+
+    @unittest.skipIf(export._import_pyarrow() is None,
+                     'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet
+        path, n_rows = self.exporter.export(self.path('results.parquet'),
+                                            rounds=(1, 10))
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, 10)
+        self.assertListEqual(table.column('round_no').to_pylist(),
+                             list(range(1, 11)))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ExportException):
+            self.exporter.export(self.path('results.xlsx'))
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ['sklearn', 'pandas', 'pyarrow', 'scipy']
+
+CHECK = '''
+import sys
+{}
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({!r}))
+print(','.join(heavy))
+'''
+
+
+class TestImports(unittest.TestCase):
+
+    def heavy_imports(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, '-c', CHECK.format(code, HEAVY_MODULES)],
+            cwd=root, capture_output=True, text=True, check=True).stdout
+
+        return output.strip()
+
+    def test_package_import_is_light(self):
+        self.assertEqual(self.heavy_imports(
+            'import blackjack\nfrom blackjack import Player, Simulator'), '')
+
+    def test_worker_does_not_import_model_dependencies(self):
+        code = '\n'.join([
+            'from blackjack.parallel import _train_worker',
+            'from blackjack.player import Player',
+            '_train_worker((Player, {"constant_epsilon": True, '
+            '"training_rounds": 20}, {}, 1, 20, 0, {}))'])
+
+        self.assertEqual(self.heavy_imports(code), '')
+
+    def test_model_imports_sklearn_on_use(self):
+        code = '\n'.join(['from blackjack.model import Model',
+                          'Model(db=object()).model'])
+
+        self.assertIn('sklearn', self.heavy_imports(code).split(','))
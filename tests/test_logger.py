@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import MagicMock
+from blackjack.logger import Logger
+
+
+class TestLogger(unittest.TestCase):
+
+    def log_rounds(self, logger, rounds=10):
+        for round_no in range(1, rounds + 1):
+            logger.log_action('Training', 1, 'hit', 'Learned', round_no)
+            logger.log_results(True, 1, 10, round_no)
+
+    def test_levels(self):
+        cases = [
+            ('full', 10, 10),
+            ('results', 0, 10),
+            ('sampled', 2, 2),
+            ('off', 0, 0)
+        ]
+
+        for level, n_actions, n_results in cases:
+            with self.subTest(level=level):
+                logger = Logger(db=MagicMock(), level=level, sample_rounds=5)
+                self.log_rounds(logger)
+
+                self.assertEqual(len(logger.actions), n_actions)
+                self.assertEqual(len(logger.results), n_results)
+
+    def test_flush_when_buffer_is_full(self):
+        db = MagicMock()
+        logger = Logger(db=db, buffer_size=4)
+        self.log_rounds(logger, rounds=5)
+
+        db.log_action_rows.assert_called_once()
+        db.log_result_rows.assert_called_once()
+        self.assertEqual(len(db.log_action_rows.call_args[0][0]), 4)
+
+        logger.flush()
+        self.assertEqual(db.log_action_rows.call_count, 2)
+        self.assertListEqual(logger.actions, [])
+
+    def test_invalid_level(self):
+        with self.assertRaises(AssertionError):
+            Logger(db=MagicMock(), level='verbose')
@@ -1,13 +1,16 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock
-from blackjack.model import Model
-import pandas as pd
+import numpy as np
+from blackjack.model import Model, ModelException, encode_features
+from blackjack.state import encode_state
 
 
 class TestModel(unittest.TestCase):
     def test_get_features_from_state(self):
         self.model = Model(MagicMock())
-        state = (('2', '3'), 'T')
+        state = encode_state(['2', '3'], 'T')
         columns = ['2_pl',
                    '3_pl',
                    '4_pl',
@@ -36,9 +39,138 @@ class TestModel(unittest.TestCase):
                    'T_ho']
 
         values = [1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1]
-        d = [{col: value for col, value in zip(columns, values)}]
-        expected = pd.DataFrame.from_dict(d)
 
         transformed = self.model._get_features_from_state(state)
         
-        self.assertEqual(expected.equals(transformed), True)
+        self.assertEqual(transformed.shape, (1, len(columns)))
+        np.testing.assert_array_equal(transformed[0], values)
+
+    def test_encode_features(self):
+        states = [encode_state(['A', 'A', 'K'], '2'), encode_state(['9', '5'], 'A')]
+        features = encode_features(states)
+
+        np.testing.assert_array_equal(features[0, :13], [0, 0, 0, 0, 0, 0, 0, 0, 2, 0, 1, 0, 0])
+        np.testing.assert_array_equal(features[1, :13], [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 0])
+        self.assertListEqual(list(features[:, 13:].argmax(axis=1)), [0, 8])
+
+    def test_predict_actions(self):
+        model = Model(MagicMock())
+        model.trained = True
+        model.model.predict.return_value = np.array([1, 0])
+        states = [encode_state(['2', '3'], 'T'), encode_state(['T', '9'], 'T')]
+
+        np.testing.assert_array_equal(model.predict_actions(states), [1, 0])
+        self.assertEqual(model.model.predict.call_args[0][0].shape, (2, 26))
+
+    def test_compile_policy(self):
+        model = Model(MagicMock())
+        model.trained = True
+        model.model.predict.side_effect = lambda features: \
+            (features[:, :13].sum(axis=1) < 3).astype(int)
+        states = [encode_state(['2', '3'], 'T'), encode_state(['2', '2', '2'], 'T')]
+
+        self.assertDictEqual(model.compile_policy(states),
+                             {states[0]: 1, states[1]: 0})
+
+        model.model.predict.reset_mock()
+        self.assertEqual(model.predict_action(states[0]), 1)
+        model.model.predict.assert_not_called()
+
+    def test_save_and_load_policy(self):
+        model = Model(MagicMock())
+        model.model = [1, 2]
+        model.policy = {encode_state(['2', '3'], 'T'): 1,
+                        encode_state(['T', '9'], 'A'): 0}
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                model.save_model()
+                loaded = Model(MagicMock())
+                loaded.load_policy()
+            finally:
+                os.chdir(cwd)
+
+        self.assertTrue(loaded.trained)
+        self.assertDictEqual(loaded.policy, model.policy)
+
+    def test_load_data_flags_changed_states(self):
+        db = MagicMock()
+        first = encode_state(['2', '3'], 'T')
+        second = encode_state(['T', '9'], 'T')
+        db.load_Q.return_value = [(first, 'hit', 2), (first, 'stand', 1),
+                                  (second, 'hit', -3), (second, 'stand', 4)]
+        model = Model(MagicMock(), db=db)
+
+        self.assertEqual(model._load_data(), 2)
+        np.testing.assert_array_equal(model.labels, [1, 0])
+
+        db.load_Q.return_value[2] = (second, 'hit', 5)
+        self.assertEqual(model._load_data(), 1)
+        np.testing.assert_array_equal(model.changed, [False, True])
+        np.testing.assert_array_equal(model.labels, [1, 1])
+        np.testing.assert_array_equal(model.features,
+                                      encode_features([first, second]))
+
+    def test_partial_fit_on_changed_states(self):
+        db = MagicMock()
+        state = encode_state(['2', '3'], 'T')
+        db.load_Q.return_value = [(state, 'hit', 2), (state, 'stand', 1)]
+        model = Model(MagicMock(), db=db)
+        model.model.predict.side_effect = lambda features: \
+            np.ones(len(features), dtype=int)
+        model.save_model = MagicMock()
+
+        model.train(validate=False)
+        model.model.fit.assert_called_once()
+        model.model.partial_fit.assert_not_called()
+
+        model.train(validate=False)
+        model.model.partial_fit.assert_not_called()
+
+        db.load_Q.return_value[0] = (state, 'hit', 3)
+        model.train(validate=False)
+        self.assertEqual(model.model.partial_fit.call_args[0][0].shape, (1, 26))
+        model.model.fit.assert_called_once()
+
+    def test_dropped_states_refit(self):
+        db = MagicMock()
+        first = encode_state(['2', '3'], 'T')
+        second = encode_state(['T', '9'], 'T')
+        db.load_Q.return_value = [(first, 'hit', 2), (first, 'stand', 1),
+                                  (second, 'hit', -3), (second, 'stand', 4)]
+        model = Model(MagicMock(), db=db)
+        model.model.predict.side_effect = lambda features: \
+            np.ones(len(features), dtype=int)
+        model.save_model = MagicMock()
+        model.train(validate=False)
+
+        # a labelled state becomes tied
+        db.load_Q.return_value[2] = (second, 'hit', 4)
+        model.train(validate=False)
+        self.assertEqual(model.dropped, 1)
+        self.assertEqual(model.model.fit.call_count, 2)
+        model.model.partial_fit.assert_not_called()
+        np.testing.assert_array_equal(model.model.fit.call_args[0][1], [1])
+
+        # a labelled state is removed
+        db.load_Q.return_value = [(second, 'hit', 5), (second, 'stand', 4)]
+        model.train(validate=False)
+        self.assertEqual(model.dropped, 1)
+        self.assertEqual(model.model.fit.call_count, 3)
+        np.testing.assert_array_equal(model.model.fit.call_args[0][1], [1])
+
+    def test_too_few_states(self):
+        db = MagicMock()
+        first = encode_state(['2', '3'], 'T')
+        second = encode_state(['T', '9'], 'T')
+        db.load_Q.return_value = [(first, 'hit', 2), (first, 'stand', 1),
+                                  (second, 'hit', -3), (second, 'stand', 4)]
+        model = Model(db=db)
+        model.save_model = MagicMock()
+
+        with self.assertRaises(ModelException):
+            model.train()
+        self.assertFalse(model.trained)
+
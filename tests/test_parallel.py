@@ -0,0 +1,69 @@
+import unittest
+from blackjack.db import DB
+from blackjack.logger import Logger
+from blackjack.model import ModelException
+from blackjack.parallel import (ParallelEvaluator, ParallelTrainer, merge_Q,
+                                proportion_interval)
+from blackjack.player import Player
+from blackjack.qstore import MemoryQStore
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_merge_Q(self):
+        master = {1: {'hit': 4, 'stand': 0}}
+        results = [
+            ({1: {'hit': 1, 'stand': 0}, 2: {'hit': 0, 'stand': 3}},
+             {(1, 'hit'): 1, (2, 'stand'): 1}),
+            ({1: {'hit': 4, 'stand': 2}}, {(1, 'hit'): 2, (1, 'stand'): 1})
+        ]
+
+        merge_Q(master, results)
+
+        self.assertDictEqual(master, {1: {'hit': 3, 'stand': 2},
+                                      2: {'hit': 0, 'stand': 3}})
+
+    def test_proportion_interval(self):
+        rate, lower, upper = proportion_interval(40, 100)
+
+        self.assertEqual(rate, 0.4)
+        self.assertAlmostEqual(lower, 0.3094, places=4)
+        self.assertAlmostEqual(upper, 0.4980, places=4)
+        self.assertEqual(proportion_interval(0, 0), (0, 0, 1))
+
+    def test_train_is_reproducible(self):
+        tables = []
+        for _ in range(2):
+            db = DB(path=':memory:')
+            player = Player(training_rounds=200, constant_epsilon=True,
+                            db=db, q_store=MemoryQStore(db),
+                            logger=Logger(db, level='off'))
+            trainer = ParallelTrainer(player, workers=2, sync_rounds=50,
+                                      seed=42).train()
+            tables.append(trainer.Q)
+
+            self.assertFalse(player.training)
+            self.assertEqual(player.t, 201)
+            self.assertTrue(player.Q.check_stateQ(next(iter(trainer.Q))))
+
+        self.assertDictEqual(tables[0], tables[1])
+
+    def test_evaluate_requires_a_trained_model(self):
+        db = DB(path=':memory:')
+        player = Player(training_rounds=0, db=db, q_store=MemoryQStore(db),
+                        logger=Logger(db, level='off'))
+
+        with self.assertRaises(ModelException):
+            ParallelEvaluator(player, workers=2).evaluate(10)
+        self.assertFalse(player.model.trained)
+
+    def test_train_with_a_shoe(self):
+        db = DB(path=':memory:')
+        player = Player(training_rounds=100, constant_epsilon=True,
+                        db=db, q_store=MemoryQStore(db),
+                        logger=Logger(db, level='off'))
+        ParallelTrainer(player, workers=2, sync_rounds=50, seed=1,
+                        n_decks=6, penetration=1).train()
+
+        self.assertFalse(player.training)
+        self.assertEqual(player.t, 101)
@@ -1,5 +1,12 @@
+import os
+import tempfile
 import unittest
+import unittest.mock
+from blackjack.db import DB
+from blackjack.logger import Logger
 from blackjack.player import Player
+from blackjack.qstore import MemoryQStore
+from blackjack.simulator import Simulator
 
 
 class TestPlayer(unittest.TestCase):
@@ -13,3 +20,25 @@ class TestPlayer(unittest.TestCase):
         house_cards = ['Kd']
         action = self.player.action(player_cards, house_cards)
         self.assertIn(action, ['stand', 'hit'])
+
+
+class TestShortRun(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_too_few_states_for_the_model(self):
+        db = DB(path='blackjack.db')
+        player = Player(training_rounds=3, constant_epsilon=True, db=db,
+                        q_store=MemoryQStore(db), logger=Logger(db))
+        Simulator(player, test_games=20).run()
+
+        self.assertFalse(player.model.trained)
+        self.assertEqual(db.connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0], 23)
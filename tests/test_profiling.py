@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from blackjack.db import DB
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.profiling import Profiler
+from blackjack.simulator import Simulator
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_phases(self):
+        db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=50, db=db, logger=Logger(db))
+        profiler = Profiler(output_dir='profile', cprofile=True,
+                            verbose=False)
+        simulator = Simulator(player, test_games=0, profiler=profiler,
+                              checkpoint_path='checkpoint.pkl')
+        simulator.run()
+
+        training = profiler.phases['training']['components']
+        self.assertEqual(training['Dealer.run_game']['calls'], 50)
+        self.assertGreater(training['Player.learn']['seconds'], 0)
+        self.assertGreater(training['DB.set_Q']['sql'], 0)
+        self.assertEqual(training['Player.learn']['sql'], 0)
+        self.assertIn('testing', profiler.phases)
+        self.assertTrue(os.path.exists('profile/training.pstats'))
+        self.assertTrue(os.path.exists('profile/training_profile.txt'))
+
+        profiler.detach()
+        self.assertNotIn('run_game', vars(simulator.dealer))
+        self.assertNotIn('set_Q', vars(db))
+
+    def test_parallel_evaluation(self):
+        db = DB(path=os.path.join(self.tmp.name, 'blackjack.db'))
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=300, db=db, logger=Logger(db))
+        profiler = Profiler(verbose=False)
+        simulator = Simulator(player, test_games=0, seed=0,
+                              profiler=profiler)
+        simulator.run()
+
+        results = simulator.evaluate(rounds=100, workers=2)
+        self.assertEqual(results['rounds'], 100)
+        self.assertIn('train', vars(player.model))
+        self.assertIn('set_Q', vars(db))
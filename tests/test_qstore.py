@@ -0,0 +1,79 @@
+import unittest
+from blackjack.db import DB
+from blackjack.qstore import ArrayQStore, MemoryQStore, QStore
+from blackjack.state import encode_state
+from blackjack.statespace import StateSpace
+
+
+class TestMemoryQStore(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DB(path=':memory:')
+        self.db.clear_tables(tables=['Q'])
+        self.store = MemoryQStore(self.db)
+        self.state = encode_state(['2', '3'], 'T')
+
+    def test_init_and_argmax(self):
+        self.store.init_Q(self.state, ['hit', 'stand'])
+        self.assertTrue(self.store.check_stateQ(self.state))
+        self.assertListEqual(self.store.argmax_Q(self.state), ['hit', 'stand'])
+
+        self.store.set_Q(self.state, 'stand', 5)
+        self.assertEqual(self.store.max_Q(self.state), 5)
+        self.assertListEqual(self.store.argmax_Q(self.state), ['stand'])
+        self.assertListEqual(self.store.argmax_Q(self.state, ['hit']), ['hit'])
+
+    def test_flush_and_load(self):
+        self.store.init_Q(self.state, ['hit', 'stand'])
+        self.store.set_Q(self.state, 'hit', 2.5)
+        self.assertEqual(len(self.db.load_Q()), 0)
+
+        self.store.flush()
+        self.assertEqual(self.db.get_Q_value(self.state, 'hit'), 2.5)
+
+        loaded = MemoryQStore(self.db).load()
+        self.assertEqual(loaded.get_Q_value(self.state, 'hit'), 2.5)
+        self.assertEqual(loaded.get_Q_value(self.state, 'stand'), 0)
+
+    def test_incomplete_store(self):
+        class IncompleteQStore(QStore):
+            def init_Q(self, state, actions):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteQStore()
+
+
+class TestArrayQStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.space = StateSpace()
+
+    def setUp(self):
+        self.db = DB(path=':memory:')
+        self.db.clear_tables(tables=['Q'])
+        self.store = ArrayQStore(self.db, space=self.space)
+        self.state = encode_state(['2', '3'], 'T')
+
+    def test_init_and_argmax(self):
+        self.assertFalse(self.store.check_stateQ(self.state))
+        self.store.init_Q(self.state, ['hit', 'stand'])
+        self.assertTrue(self.store.check_stateQ(self.state))
+        self.assertListEqual(self.store.argmax_Q(self.state), ['hit', 'stand'])
+
+        self.store.set_Q(self.state, 'stand', 5)
+        self.assertEqual(self.store.max_Q(self.state), 5)
+        self.assertListEqual(self.store.argmax_Q(self.state), ['stand'])
+        self.assertListEqual(self.store.argmax_Q(self.state, ['hit']), ['hit'])
+
+    def test_flush_and_load(self):
+        self.store.init_Q(self.state, ['hit', 'stand'])
+        self.store.set_Q(self.state, 'hit', 2.5)
+        self.store.flush()
+        self.assertEqual(self.db.get_Q_value(self.state, 'hit'), 2.5)
+
+        loaded = ArrayQStore(self.db, space=self.space).load()
+        self.assertEqual(loaded.get_Q_value(self.state, 'hit'), 2.5)
+        self.assertEqual(loaded.get_Q_value(self.state, 'stand'), 0)
+        self.assertIsNone(loaded.get_Q_value(encode_state(['T', '9'], 'T'), 'hit'))
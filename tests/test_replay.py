@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from blackjack.logger import Logger
+from blackjack.replay import (ACTION_DTYPE, ReplayException, ReplayReader,
+                              ReplayWriter, read_log)
+from blackjack.state import encode_state
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = ReplayWriter(self.tmp.name)
+        self.reader = ReplayReader(self.tmp.name)
+        self.state = encode_state(['T', '9'], 'A')
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def test_write_and_read(self):
+        self.writer.log_action_rows([('Training', self.state, 'hit', 'Exploring', 1),
+                                     ('Testing', self.state, 'stand', 'Modelled', 2)])
+        self.writer.log_result_rows([('Testing', self.state, -10, 2)])
+        self.writer.flush()
+
+        actions = self.reader.actions
+        self.assertEqual(ACTION_DTYPE.itemsize, 19)
+        self.assertIsInstance(actions, np.memmap)
+        np.testing.assert_array_equal(actions['round_no'], [1, 2])
+        np.testing.assert_array_equal(actions['phase'], [0, 1])
+        np.testing.assert_array_equal(actions['action'], [1, 0])
+        np.testing.assert_array_equal(actions['decision'], [1, 2])
+        self.assertEqual(actions['state'][0], self.state)
+        self.assertEqual(self.reader.results['result'][0], -10)
+
+    def test_clear_and_append(self):
+        self.writer.log_result_rows([('Training', self.state, 10, 1)])
+        self.writer.clear()
+        self.assertEqual(len(self.reader.results), 0)
+
+        self.writer.log_result_rows([('Training', self.state, 0, 2)])
+        self.writer.close()
+        self.writer = ReplayWriter(self.tmp.name, append=True)
+        self.writer.log_result_rows([('Testing', self.state, 10, 3)])
+        self.writer.flush()
+
+        chunks = list(self.reader.chunks('results', chunk_size=1))
+        self.assertListEqual([int(chunk['round_no'][0]) for chunk in chunks], [2, 3])
+
+    def test_delete_rounds(self):
+        self.writer.log_result_rows([('Training', self.state, 10, round_no)
+                                     for round_no in range(1, 6)])
+        self.writer.log_action_rows([('Training', self.state, 'hit',
+                                      'Learned', 1)])
+        self.writer.delete_rounds(3)
+        self.writer.log_result_rows([('Training', self.state, 0, 3)])
+        self.writer.flush()
+
+        np.testing.assert_array_equal(self.reader.results['round_no'],
+                                      [1, 2, 3])
+        self.assertEqual(self.reader.results['result'][-1], 0)
+        self.assertEqual(len(self.reader.actions), 1)
+
+    def test_header_is_checked(self):
+        with self.assertRaises(ReplayException):
+            read_log(os.path.join(self.tmp.name, 'actions.bin'), 'results')
+
+    def test_logger_sink(self):
+        logger = Logger(db=None, sink=self.writer, buffer_size=10)
+        self.assertIsNone(logger.db)
+        logger.log_action('Training', self.state, 'hit', 'Learned', 1)
+        logger.log_results(True, self.state, 10, 1)
+        logger.flush()
+
+        self.assertEqual(len(self.reader.actions), 1)
+        self.assertEqual(len(self.reader.results), 1)
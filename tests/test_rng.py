@@ -0,0 +1,81 @@
+import pickle
+import unittest
+from array import array
+from blackjack.db import DB
+from blackjack.dealer import Dealer
+from blackjack.deck import Shoe
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.qstore import MemoryQStore
+from blackjack.rng import RNG
+
+
+class TestRNG(unittest.TestCase):
+
+    def draw(self, rng, n=10):
+        return ([rng.random() for _ in range(n)],
+                [rng.choice(['hit', 'stand']) for _ in range(n)],
+                [rng.permutation(52) for _ in range(n)])
+
+    def test_seed_is_reproducible(self):
+        self.assertEqual(self.draw(RNG(1, block_size=16)),
+                         self.draw(RNG(1, block_size=16)))
+        self.assertNotEqual(self.draw(RNG(1)), self.draw(RNG(2)))
+
+    def test_draws(self):
+        rng = RNG(0, block_size=8)
+        values = [rng.random() for _ in range(100)]
+        self.assertTrue(all(0 <= value < 1 for value in values))
+        self.assertEqual(len(set(values)), 100)
+
+        for _ in range(20):
+            self.assertListEqual(sorted(rng.permutation(52)), list(range(52)))
+
+        self.assertEqual(rng.choice(['stand']), 'stand')
+
+    def test_shuffle(self):
+        rng = RNG(0)
+        cards = list('abcdefghij')
+        rng.shuffle(cards)
+        self.assertListEqual(sorted(cards), list('abcdefghij'))
+
+        codes = array('B', range(52)) * 2
+        rng.shuffle(codes)
+        self.assertEqual(codes.typecode, 'B')
+        self.assertListEqual(sorted(codes), sorted(array('B', range(52)) * 2))
+        self.assertNotEqual(codes, array('B', range(52)) * 2)
+
+    def test_spawn(self):
+        children = RNG(3).spawn(2)
+        again = RNG(3).spawn(2)
+
+        self.assertEqual(self.draw(children[0]), self.draw(again[0]))
+        self.assertNotEqual(self.draw(children[0]), self.draw(children[1]))
+
+    def test_state(self):
+        rng = RNG(5, block_size=16)
+        self.draw(rng, 7)
+        state = rng.getstate()
+        copied = pickle.loads(pickle.dumps(rng))
+        expected = self.draw(rng, 30)
+
+        self.assertEqual(self.draw(copied, 30), expected)
+        rng.setstate(state)
+        self.assertEqual(self.draw(rng, 30), expected)
+
+    def test_seeded_runs_are_reproducible(self):
+        tables = []
+        for _ in range(2):
+            db = DB(path=':memory:')
+            player = Player(epsilon=0.5, constant_epsilon=True,
+                            training_rounds=200, db=db, rng=RNG(7),
+                            q_store=MemoryQStore(db),
+                            logger=Logger(db, level='off'))
+            dealer = Dealer(player, n_decks=2)
+            self.assertIs(dealer.deck.rng, player.rng)
+            while player.training:
+                dealer.run_game()
+            tables.append(player.Q.Q)
+
+        self.assertDictEqual(tables[0], tables[1])
+        self.assertIsInstance(dealer.deck, Shoe)
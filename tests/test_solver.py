@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from blackjack.batch import BatchDealer
+from blackjack.solver import Solver
+from blackjack.state import encode_state
+
+
+class TestSolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.infinite = Solver().solve()
+        cls.single = Solver(n_decks=1).solve()
+
+    def test_house_outcomes(self):
+        outcomes = self.single._house_outcomes(0, np.eye(13)[[0, 5]] + np.eye(13)[0])
+        np.testing.assert_allclose(outcomes.sum(axis=1), 1)
+
+    def test_basic_strategy(self):
+        policy = self.infinite.policy
+        self.assertEqual(policy[encode_state(['T', '6'], 'T')], 'hit')
+        self.assertEqual(policy[encode_state(['T', '6'], '6')], 'stand')
+        self.assertEqual(policy[encode_state(['T', '2'], '4')], 'stand')
+        self.assertEqual(policy[encode_state(['A', '7'], '9')], 'hit')
+        self.assertEqual(policy[encode_state(['T', '8'], 'A')], 'stand')
+        self.assertNotIn(encode_state(['A', 'K'], '2'), policy)
+
+    def test_regret(self):
+        result = self.single.regret(self.single.policy)
+        self.assertAlmostEqual(result['regret'], 0)
+        self.assertEqual(result['mistakes'], 0)
+
+        stand = self.single.regret({}, default_action='stand')
+        self.assertGreater(stand['regret'], 1)
+        self.assertGreater(stand['mistakes'], 0)
+
+    def test_matches_simulation(self):
+        rewards = BatchDealer(self.single.policy, seed=0).play(200000)
+        margin = 4 * rewards.std() / np.sqrt(len(rewards))
+        self.assertAlmostEqual(rewards.mean(), self.single.game_value(),
+                               delta=margin)
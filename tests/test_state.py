@@ -0,0 +1,59 @@
+import unittest
+from blackjack.state import (decode_state, encode_state, n_cards,
+                             neighbor_levels, reachable_states,
+                             unique_predecessors)
+
+
+class TestState(unittest.TestCase):
+
+    def test_encode_decode(self):
+        cases = [
+            (['As', '4c'], 'Kd', (('4', 'A'), 'K')),
+            (['Td', '2c', 'Th'], '2s', (('2', 'T', 'T'), '2')),
+            (['2'] * 11, 'A', (tuple(['2'] * 11), 'A')),
+            (['A'] * 22, '7', (tuple(['A'] * 22), '7'))
+        ]
+
+        for player, house, decoded in cases:
+            with self.subTest(player=player, house=house):
+                state = encode_state(player, house)
+                self.assertEqual(decode_state(state), decoded)
+                self.assertEqual(n_cards(state), len(player))
+
+    def test_order_and_suits_are_ignored(self):
+        self.assertEqual(encode_state(['As', '4c'], 'Kd'),
+                         encode_state(['4h', 'Ad'], 'Ks'))
+        self.assertNotEqual(encode_state(['As', '4c'], 'Kd'),
+                            encode_state(['As', '4c'], 'Qd'))
+
+    def test_unique_predecessors(self):
+        state = encode_state(['2', '2', '3'], 'T')
+        decoded = [decode_state(s) for s in unique_predecessors(state)]
+
+        self.assertListEqual(decoded, [(('2', '3'), 'T'), (('2', '2'), 'T')])
+
+    def test_neighbor_levels(self):
+        state = encode_state(['2', '2', '3', '4'], 'T')
+        levels = neighbor_levels(state)
+
+        self.assertEqual(len(levels), 2)
+        self.assertEqual(len(levels[0]), 3)
+        self.assertEqual(len(levels[1]), 4)
+
+        successors = dict(levels[1])[encode_state(['2', '3'], 'T')]
+        self.assertEqual(len(successors), 2)
+
+        self.assertEqual(len(neighbor_levels(state, 1)), 1)
+        self.assertEqual(neighbor_levels(encode_state(['2', '3'], 'T')), ())
+
+    def test_reachable_states(self):
+        states = reachable_states(max_per_rank=4)
+
+        self.assertEqual(len(states), len(set(states)))
+        self.assertIn(encode_state(['2', '3'], 'T'), states)
+        self.assertIn(encode_state(['A', 'A', '8'], '2'), states)
+        self.assertNotIn(encode_state(['A', 'K'], '2'), states)
+        self.assertNotIn(encode_state(['T', '5', '7'], '2'), states)
+        self.assertNotIn(encode_state(['5'], '2'), states)
+        self.assertNotIn(encode_state(['2'] * 5, '2'), states)
+        self.assertTrue(all(n_cards(state) >= 2 for state in states))
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from blackjack.state import encode_state, reachable_states
+from blackjack.statespace import StateSpace
+
+
+class TestStateSpace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.space = StateSpace()
+
+    def test_dense_index(self):
+        keys = self.space.keys
+        self.assertTrue(np.all(keys[1:] > keys[:-1]))
+        self.assertEqual(self.space.index[int(keys[10])], 10)
+        self.assertIn(encode_state(['A', 'K'], '2'), self.space)
+        self.assertNotIn(encode_state(['T', '9', '5'], '2'), self.space)
+
+        states = [encode_state(['2', '3'], 'T'), encode_state(['T', '9', '5'], '2')]
+        index = self.space.index_of(states)
+        self.assertEqual(index[0], self.space.index[states[0]])
+        self.assertEqual(index[1], -1)
+
+    def test_decision_states_are_reachable(self):
+        decisions = set(reachable_states())
+        keys = self.space.keys[self.space.values < 21].tolist()
+        self.assertSetEqual(set(keys), decisions)
+
+    def test_metadata(self):
+        i = self.space.index[encode_state(['A', '5'], '2')]
+        self.assertEqual(self.space.values[i], 16)
+        self.assertTrue(self.space.soft[i])
+        self.assertEqual(len(self.space.predecessors(i)), 0)
+
+        i = self.space.index[encode_state(['A', '5', 'K'], '2')]
+        self.assertEqual(self.space.values[i], 16)
+        self.assertFalse(self.space.soft[i])
+        self.assertEqual(self.space.n_cards[i], 3)
+        # A + K is 21, the player could not have hit from it
+        self.assertSetEqual(set(self.space.keys[self.space.predecessors(i)]),
+                            {encode_state(['A', '5'], '2'),
+                             encode_state(['5', 'K'], '2')})
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from blackjack.db import DB
+from blackjack.logger import Logger
+from blackjack.player import Player
+from blackjack.qstore import SQLiteQStore
+from blackjack.rng import RNG
+from blackjack.simulator import Simulator
+from blackjack.writer import AsyncWriter, WriterException
+
+
+class TestAsyncWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.path = os.path.join(self.tmp.name, 'blackjack.db')
+        self.db = DB(path=self.path, async_writes=True, queue_size=2)
+
+    def tearDown(self):
+        self.db.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def count(self, table):
+        with sqlite3.connect(self.path) as con:
+            return con.execute(
+                'SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0]
+
+    def test_rows_are_written_in_background(self):
+        for round_no in range(1, 101):
+            self.db.log_action_rows(
+                [('Training', 1, 'hit', 'Learned', round_no)])
+            self.db.log_results(True, 1, 10, round_no)
+            self.db.end_round()
+
+        self.assertTrue(self.db.writer.alive)
+        self.db.commit()
+        self.assertEqual(self.count('actions'), 100)
+        self.assertEqual(self.count('results'), 100)
+
+    def test_bulk_Q_writes_are_read_back(self):
+        self.db.set_many_Q([(1, 'hit', 2), (1, 'stand', 3)])
+
+        self.assertEqual(sorted(self.db.load_Q()),
+                         [(1, 'hit', 2), (1, 'stand', 3)])
+
+    def test_close_stops_the_thread(self):
+        self.db.log_results(True, 1, 10, 1)
+        writer = self.db.writer
+        self.db.close()
+
+        self.assertFalse(writer.alive)
+        self.assertEqual(self.count('results'), 1)
+
+        # the exit handler does not keep the closed writer alive
+        self.assertEqual(sys.getrefcount(writer), 2)
+
+        # a new writer is started on the next write
+        self.db.log_results(True, 1, 10, 2)
+        self.assertIsNot(self.db.writer, writer)
+        self.db.commit()
+        self.assertEqual(self.count('results'), 2)
+
+    def test_errors_are_raised(self):
+        self.db.log_results(True, 1, 10, 1)
+        self.db.log_results(True, 1, 10, 1)
+
+        with self.assertRaises(WriterException):
+            self.db.commit()
+
+    def test_in_memory_database(self):
+        with self.assertRaises(WriterException):
+            AsyncWriter(DB(path=':memory:'))
+
+    def test_synchronous_Q_writes_between_commits(self):
+        # the Q values are written on the main connection, which keeps its
+        # transaction open for up to `commit_rounds` rounds
+        db = DB(path=self.path, commit_rounds=100, async_writes=True)
+        player = Player(epsilon=0.5, constant_epsilon=True,
+                        training_rounds=150, q_store=SQLiteQStore(db),
+                        db=db, logger=Logger(db, buffer_size=50),
+                        rng=RNG(0))
+        Simulator(player, test_games=0, seed=0).run()
+        db.close()
+
+        self.assertEqual(self.count('results'), 150)
+        self.assertGreater(self.count('Q'), 0)